@@ -0,0 +1,224 @@
+"""
+Admission control for emotion inference.
+
+Inference is the expensive, CPU-bound step of a turn. Instead of letting
+requests pile up in the CPU pool until their clients time out, calls are
+admitted through ``InferenceAdmission``:
+
+- at most ``slots`` inferences run at once (one per CPU pool worker), the
+  rest wait in a FIFO queue bounded at ``max_queue``; beyond that the
+  request is refused at once with 503 and a Retry-After estimate;
+- each caller (bearer token, or client address) has at most ``per_user``
+  inferences running or queued, further ones get 429;
+- queued work carries the request deadline and a disconnect check, and is
+  dropped instead of run once its deadline passes or its client has gone.
+
+Routes use ``should_degrade()`` to skip inference altogether (neutral, no
+confidence) once the queue is ``degrade_queue`` long, so the turn still gets
+a reply under overload.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+from fastapi import HTTPException
+
+from app import metrics
+from app.config import settings
+from app.executor import run_cpu
+
+# How often a queued request checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class Overloaded(HTTPException):
+    """503: the inference queue is full, or the request could not be served in time."""
+
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(status_code=503, detail=detail, headers={"Retry-After": str(retry_after)})
+        self.retry_after = retry_after
+
+
+class TooManyRequests(HTTPException):
+    """429: the caller already has ``per_user`` inferences in flight."""
+
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(status_code=429, detail=detail, headers={"Retry-After": str(retry_after)})
+        self.retry_after = retry_after
+
+
+class InferenceAdmission:
+    """Bounded FIFO admission in front of ``run_cpu``.
+
+    Must be used from the event loop only; no locking is needed since all
+    bookkeeping happens between awaits.
+    """
+
+    def __init__(self, slots: int, max_queue: int, per_user: int = 0, degrade_queue: int = 0):
+        self.slots = max(1, slots)
+        self.max_queue = max_queue
+        self.per_user = per_user
+        self.degrade_queue = degrade_queue
+        self.running = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._per_key: dict[str, int] = {}
+        # Moving average of one inference, used for the Retry-After estimate
+        self._service_seconds = 0.5
+        self.counts: dict[str, int] = {}
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _count(self, outcome: str) -> None:
+        self.counts[outcome] = self.counts.get(outcome, 0) + 1
+        metrics.ADMISSIONS.inc(outcome)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained."""
+        backlog = self.queued + self.running
+        return max(1, math.ceil(backlog * self._service_seconds / self.slots))
+
+    def should_degrade(self) -> bool:
+        """True if new turns should skip inference rather than join the queue."""
+        if self.degrade_queue > 0 and self.queued >= self.degrade_queue:
+            self._count("degraded")
+            return True
+        return False
+
+    def _release(self) -> None:
+        # Hand the slot straight to the next live waiter
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+    def _finished(self, start: float) -> Callable[[asyncio.Future], None]:
+        def done(task: asyncio.Future) -> None:
+            if not task.cancelled() and task.exception() is None:
+                elapsed = time.perf_counter() - start
+                self._service_seconds = 0.8 * self._service_seconds + 0.2 * elapsed
+            self._release()
+
+        return done
+
+    async def _wait_for_slot(
+        self, deadline: float, disconnected: Callable[[], Awaitable[bool]] | None
+    ) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._count("expired")
+                    raise Overloaded("Request deadline passed while queued", self.retry_after())
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter), min(remaining, DISCONNECT_POLL_SECONDS))
+                    return
+                except asyncio.TimeoutError:
+                    pass
+                if disconnected is not None and await disconnected():
+                    self._count("disconnected")
+                    raise Overloaded("Client disconnected while queued", self.retry_after())
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as we gave up: pass it on
+                self._release()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+    async def run(
+        self,
+        func: Callable[..., Any],
+        *args,
+        key: str | None = None,
+        deadline: float | None = None,
+        disconnected: Callable[[], Awaitable[bool]] | None = None,
+        wait: bool = True,
+    ) -> Any:
+        """Run ``func(*args)`` in the CPU pool once admitted.
+
+        ``deadline`` is a ``time.monotonic()`` timestamp; ``disconnected`` is
+        polled while queued. With ``wait=False`` the call is refused unless
+        a slot is free right now (for optional, speculative work).
+        """
+        if deadline is None:
+            deadline = time.monotonic() + settings.REQUEST_DEADLINE_SECONDS
+
+        if key is not None and self.per_user > 0 and self._per_key.get(key, 0) >= self.per_user:
+            self._count("rejected_user")
+            raise TooManyRequests("Too many concurrent requests", self.retry_after())
+
+        busy = self.running >= self.slots or bool(self._waiters)
+        if busy and (not wait or self.queued >= self.max_queue):
+            self._count("rejected_queue")
+            raise Overloaded("Server is busy, please retry", self.retry_after())
+
+        if key is not None:
+            self._per_key[key] = self._per_key.get(key, 0) + 1
+        try:
+            if busy:
+                await self._wait_for_slot(deadline, disconnected)
+            else:
+                self.running += 1
+            self._count("admitted")
+            # The slot is held until the worker thread is done, even if this
+            # request is cancelled meanwhile (the thread cannot be stopped)
+            task = asyncio.ensure_future(run_cpu(_before_deadline, deadline, func, *args))
+            task.add_done_callback(self._finished(time.perf_counter()))
+            return await asyncio.shield(task)
+        finally:
+            if key is not None:
+                self._per_key[key] -= 1
+                if not self._per_key[key]:
+                    del self._per_key[key]
+
+    def stats(self) -> dict:
+        return {
+            "slots": self.slots,
+            "running": self.running,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "service_seconds": round(self._service_seconds, 4),
+            **self.counts,
+        }
+
+
+def _before_deadline(deadline: float, func: Callable[..., Any], *args) -> Any:
+    # Last check in the worker thread, after any wait in the pool's own queue
+    if time.monotonic() > deadline:
+        raise Overloaded("Request deadline passed while queued", 1)
+    return func(*args)
+
+
+def request_deadline(timeout_header: str | None) -> float:
+    """Monotonic deadline from an ``X-Request-Timeout: <seconds>`` header.
+
+    The client can only shorten the server's REQUEST_DEADLINE_SECONDS.
+    """
+    timeout = settings.REQUEST_DEADLINE_SECONDS
+    try:
+        if timeout_header:
+            timeout = min(timeout, max(0.0, float(timeout_header)))
+    except ValueError:
+        pass
+    return time.monotonic() + timeout
+
+
+inference = InferenceAdmission(
+    slots=settings.CPU_POOL_WORKERS,
+    max_queue=settings.INFERENCE_QUEUE_MAX,
+    per_user=settings.INFERENCE_PER_USER,
+    degrade_queue=settings.INFERENCE_DEGRADE_QUEUE,
+)
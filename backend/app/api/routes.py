@@ -2,22 +2,132 @@
 API routes for the chatbot application.
 """
 
+import asyncio
+import json
 import logging
+import re
+from dataclasses import dataclass
 from datetime import date, datetime
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Header, Query
+from typing import AsyncIterator, BinaryIO
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import numpy as np
+from fastapi import (
+    APIRouter, UploadFile, File, Form, HTTPException, Header, Query, Request, WebSocket, WebSocketDisconnect,
+)
+from fastapi.responses import FileResponse, StreamingResponse
 from app.config import settings
-from app.models import ChatResponse
-from app.services import (
-    emotion_service,
-    chatbot_service,
+from app import admission
+from app.executor import run_io
+from app.models import ChatResponse, EmotionRangeResponse
+from app import services
+from app.services.chat_history import (
+    enqueue_message,
+    get_emotion_histogram,
+    get_emotion_stats_by_date,
+    get_recent_messages,
 )
-from app.services.chat_history import save_message, get_recent_messages, get_emotion_stats_by_date
+from app.services.audio_decode import PCM_DTYPES, PcmBuffer, is_supported_content_type
 from app.services.auth import get_user_id_from_token
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+# Services load on first use; resolve them inside the worker thread so a
+# cold import never runs on the event loop.
+def _prepare_emotion(audio: BinaryIO) -> tuple:
+    return services.emotion_service.prepare_upload(audio)
+
+
+def _prepare_emotion_pcm(data: np.ndarray, sample_rate: int) -> tuple:
+    return services.emotion_service.prepare(data, sample_rate)
+
+
+def _run_emotion_model(data: np.ndarray, cache_key: str | None) -> dict:
+    return services.emotion_service.infer(data, cache_key)
+
+
+async def _chatbot():
+    return await run_io(getattr, services, "chatbot_service")
+
+
+async def _tts():
+    return await run_io(getattr, services, "tts_service")
+
+
+async def _reply_audio_url(reply_text: str) -> str | None:
+    """URL of the spoken reply; synthesis continues in the background."""
+    if not settings.TTS_ENABLED:
+        return None
+    try:
+        name = (await _tts()).schedule(reply_text)
+    except Exception as tts_err:
+        logger.warning(f"TTS scheduling failed: {tts_err}")
+        return None
+    return f"/tts/{name}" if name else None
+
+
+# Used instead of inference under overload (see INFERENCE_DEGRADE_QUEUE)
+DEGRADED_EMOTION = {"emotion": "neutral", "confidence": None}
+
+
+def _caller_key(authorization: str | None, client) -> str | None:
+    """Identify the caller for per-user limits before the token is verified."""
+    if authorization:
+        return authorization
+    return f"ip:{client.host}" if client else None
+
+
+async def _infer_emotion(
+    prepare, *args, key: str | None, deadline: float | None = None, disconnected=None, wait: bool = True
+) -> dict:
+    """Emotion inference through admission control; degrades to neutral when overloaded.
+
+    Decoding and the result cache lookup (``prepare``) run before admission,
+    so a retried recording is answered from the cache even when the queue is
+    full. They go to the I/O pool: they are short, and in the CPU pool they
+    would wait behind the admitted inferences occupying every worker.
+    """
+    data, cache_key, cached = await run_io(prepare, *args)
+    if cached is not None:
+        return cached
+    if wait and admission.inference.should_degrade():
+        logger.info("Inference queue is long, skipping emotion inference")
+        return dict(DEGRADED_EMOTION)
+    return await admission.inference.run(
+        _run_emotion_model, data, cache_key, key=key, deadline=deadline, disconnected=disconnected, wait=wait
+    )
+
+
+async def _load_user_context(authorization: str | None) -> tuple[str | None, list[dict]]:
+    """Resolve the user from the token, then fetch their recent messages."""
+    if not authorization:
+        return None, []
+
+    try:
+        user_id = await run_io(get_user_id_from_token, authorization)
+    except Exception as auth_err:
+        logger.warning(f"Auth failed: {auth_err}")
+        return None, []
+
+    try:
+        # The chatbot trims this to its token budget
+        recent_messages = await run_io(get_recent_messages, user_id, limit=settings.CONTEXT_CACHE_TURNS)
+    except Exception as fetch_err:
+        logger.warning(f"Failed to fetch recent messages: {fetch_err}")
+        recent_messages = []
+
+    return user_id, recent_messages
+
+
+def _queue_message(**message) -> None:
+    """Hand a message to the write-behind queue; a failure never fails the turn."""
+    try:
+        enqueue_message(**message)
+    except Exception as save_err:
+        logger.error(f"Failed to queue {message['role']} message: {save_err}")
+
+
 def _validate_audio_file(file: UploadFile) -> None:
     """Validate audio file."""
     # Check file size
@@ -27,108 +137,454 @@ def _validate_audio_file(file: UploadFile) -> None:
             detail=f"File quá lớn (max {settings.MAX_AUDIO_SIZE / (1024*1024):.0f}MB)",
         )
 
-    # Check content type - WAV only
-    if file.content_type not in ["audio/wav", "audio/x-wav"]:
-        raise HTTPException(status_code=400, detail="Chỉ hỗ trợ định dạng WAV")
+    # Check content type - WAV, FLAC, OGG/Opus or WebM
+    if not is_supported_content_type(file.content_type):
+        raise HTTPException(status_code=400, detail="Chỉ hỗ trợ định dạng WAV, FLAC, OGG/Opus, WebM")
+
+
+@dataclass
+class _ChatTurn:
+    user_text: str
+    emotion: str
+    confidence: float | None
+    user_id: str | None
+    recent_messages: list[dict]
+    use_cache: bool = True
+
+
+async def _prepare_turn(
+    request: Request,
+    file: UploadFile,
+    text: str,
+    authorization: str | None,
+    request_timeout: str | None,
+) -> _ChatTurn:
+    """Validate input, run emotion inference and load user context.
+
+    Inference is admitted through ``admission.inference``, which may refuse
+    the request (503/429) or drop it while queued once its deadline passes
+    or the client disconnects. The user message is queued for persistence
+    before returning.
+    """
+    # Validate
+    _validate_audio_file(file)
+
+    # The upload is already spooled (memory, then disk past 1 MB); it is
+    # decoded block by block in the CPU pool instead of read into memory
+    if not file.size:
+        raise HTTPException(400, "Audio file is empty")
+    await file.seek(0)
+
+    # User text (required)
+    user_text = (text or "").strip()
+    if not user_text:
+        raise HTTPException(400, "Thiếu 'text' từ frontend STT")
+
+    logger.info(
+        f"Processing chat: text_len={len(user_text)}, audio_size={file.size} bytes, "
+        f"content_type={file.content_type}"
+    )
+
+    # Emotion inference runs in parallel with auth -> history fetch
+    emotion_result, (user_id, recent_messages) = await asyncio.gather(
+        _infer_emotion(
+            _prepare_emotion,
+            file.file,
+            key=_caller_key(authorization, request.client),
+            deadline=admission.request_deadline(request_timeout),
+            disconnected=request.is_disconnected,
+        ),
+        _load_user_context(authorization),
+    )
+    emotion = emotion_result["emotion"]
+    confidence = emotion_result["confidence"]
+
+    # Queue user message for write-behind persistence
+    if user_id:
+        _queue_message(
+            user_id=user_id,
+            role="user",
+            content=user_text,
+            emotion=emotion,
+            confidence=confidence,
+        )
+
+    return _ChatTurn(user_text, emotion, confidence, user_id, recent_messages)
+
+
+def _finish_turn(turn: _ChatTurn, reply_text: str) -> None:
+    """Queue the assistant reply (the writer keeps it after the user message)."""
+    if turn.user_id:
+        _queue_message(
+            user_id=turn.user_id,
+            role="assistant",
+            content=reply_text,
+            emotion=None,
+            confidence=None,
+        )
+
+    confidence = "none" if turn.confidence is None else f"{turn.confidence:.2f}"
+    logger.info(f"Chat completed: emotion={turn.emotion}, confidence={confidence}")
+
+
+def _use_reply_cache(cache_control: str | None) -> bool:
+    """A ``Cache-Control: no-cache`` request header bypasses the reply cache."""
+    return "no-cache" not in (cache_control or "").lower()
 
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
+    request: Request,
     file: UploadFile = File(...),
     text: str = Form(default=""),
     authorization: str = Header(default=None),
+    cache_control: str = Header(default=None),
+    x_request_timeout: str = Header(default=None),
 ):
     """
     Main chat endpoint - Processes audio + saves to DB if user logged in.
     """
     try:
-        # Validate
-        _validate_audio_file(file)
+        turn = await _prepare_turn(request, file, text, authorization, x_request_timeout)
+        turn.use_cache = _use_reply_cache(cache_control)
 
-        # Read audio
-        audio_bytes = await file.read()
-        if not audio_bytes:
-            raise HTTPException(400, "Audio file is empty")
+        # Chat Response
+        chatbot = await _chatbot()
+        reply_text = await chatbot.get_reply(
+            user_text=turn.user_text,
+            emotion=turn.emotion,
+            recent_messages=turn.recent_messages,
+            use_cache=turn.use_cache,
+            user_id=turn.user_id,
+        )
 
-        # User text (required)
-        user_text = (text or "").strip()
-        if not user_text:
-            raise HTTPException(400, "Thiếu 'text' từ frontend STT")
+        _finish_turn(turn, reply_text)
 
-        logger.info(
-            f"Processing chat: text_len={len(user_text)}, audio_size={len(audio_bytes)} bytes"
+        return ChatResponse(
+            user_text=turn.user_text,
+            reply_text=reply_text,
+            emotion=turn.emotion,
+            confidence=turn.confidence,
+            audio_url=await _reply_audio_url(reply_text),
         )
 
-        # Emotion Detection from audio
-        emotion_result = emotion_service.predict(audio_bytes)
-        emotion = emotion_result["emotion"]
-        confidence = emotion_result["confidence"]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Chat endpoint error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
 
-        # Get user_id from token if provided
-        user_id = None
-        if authorization:
-            try:
-                user_id = get_user_id_from_token(authorization)
-            except Exception as auth_err:
-                logger.warning(f"Auth failed: {auth_err}")
 
-        # Save user message if logged in
-        if user_id:
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _turn_events(turn: _ChatTurn) -> AsyncIterator[tuple[str, dict]]:
+    """Emit the emotion result, then reply tokens, then the full reply."""
+    yield "emotion", {"user_text": turn.user_text, "emotion": turn.emotion, "confidence": turn.confidence}
+
+    chunks = []
+    try:
+        chatbot = await _chatbot()
+        async for token in chatbot.stream_reply(
+            user_text=turn.user_text,
+            emotion=turn.emotion,
+            recent_messages=turn.recent_messages,
+            use_cache=turn.use_cache,
+            user_id=turn.user_id,
+        ):
+            chunks.append(token)
+            yield "token", {"text": token}
+
+        reply_text = "".join(chunks).strip()
+        yield "done", {"reply_text": reply_text, "audio_url": await _reply_audio_url(reply_text)}
+    except Exception as e:
+        logger.error(f"Chat stream error: {e}", exc_info=True)
+        yield "error", {"detail": "Internal server error"}
+    finally:
+        # Persist whatever the user received, even if they disconnected
+        reply_text = "".join(chunks).strip()
+        if reply_text:
+            _finish_turn(turn, reply_text)
+
+
+async def _stream_turn(turn: _ChatTurn) -> AsyncIterator[str]:
+    async for event, data in _turn_events(turn):
+        yield _sse(event, data)
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    text: str = Form(default=""),
+    authorization: str = Header(default=None),
+    cache_control: str = Header(default=None),
+    x_request_timeout: str = Header(default=None),
+):
+    """
+    Streaming chat endpoint (Server-Sent Events).
+
+    Events: "emotion" as soon as inference finishes, one "token" per reply
+    chunk as the LLM produces it, then "done" with the full reply (and its
+    audio_url when TTS is enabled).
+    """
+    try:
+        turn = await _prepare_turn(request, file, text, authorization, x_request_timeout)
+        turn.use_cache = _use_reply_cache(cache_control)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Chat stream endpoint error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    return StreamingResponse(
+        _stream_turn(turn),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Accepted /chat/ws sample rates (the buffer is sized by rate x duration)
+WS_MIN_SAMPLE_RATE = 8000
+WS_MAX_SAMPLE_RATE = 96000
+
+
+def _discard_result(task: asyncio.Task) -> None:
+    # Retrieve the exception of a speculative run nobody awaited
+    if not task.cancelled():
+        task.exception()
+
+
+class _ChatSession:
+    """State of one WebSocket chat session (see ``chat_ws``).
+
+    Auth and history are loaded once per session and history is kept
+    current locally, so turns need neither. While audio streams in, emotion
+    inference runs on the whole utterance so far every
+    EMOTION_STREAM_INTERVAL_SECONDS; at end-of-utterance the latest run is
+    reused if it is missing at most EMOTION_STREAM_STALE_SECONDS of audio.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.caller: str | None = None
+        self.user_id: str | None = None
+        self.history: list[dict] = []
+        self.use_cache = True
+        self.sample_rate = 16000
+        self.encoding = "pcm_f32le"
+        self.audio: PcmBuffer | None = None
+        self.text = ""
+        self._speculative: tuple[asyncio.Task, int] | None = None
+        self._next_inference = 0
+
+    async def send(self, event: str, **data) -> None:
+        await self.websocket.send_json({"type": event, **data})
+
+    async def start(self, message: dict) -> None:
+        # Validate before touching the session, so a bad start keeps the old one
+        try:
+            sample_rate = int(message.get("sample_rate", 16000))
+        except (TypeError, ValueError):
+            sample_rate = 0
+        if not WS_MIN_SAMPLE_RATE <= sample_rate <= WS_MAX_SAMPLE_RATE:
+            await self.send(
+                "error", detail=f"sample_rate must be {WS_MIN_SAMPLE_RATE}-{WS_MAX_SAMPLE_RATE} Hz"
+            )
+            return
+        encoding = message.get("encoding", "pcm_f32le")
+        if encoding not in PCM_DTYPES:
+            await self.send("error", detail=f"encoding must be one of: {', '.join(PCM_DTYPES)}")
+            return
+
+        self.sample_rate = sample_rate
+        self.encoding = encoding
+        self.use_cache = not message.get("no_cache", False)
+        self._reset()
+        self.caller = _caller_key(message.get("authorization"), self.websocket.client)
+        self.user_id, self.history = await _load_user_context(message.get("authorization"))
+        await self.send("ready", authenticated=self.user_id is not None)
+
+    def _reset(self) -> None:
+        self.audio = PcmBuffer(self.sample_rate, self.encoding, settings.EMOTION_MAX_DECODE_SECONDS)
+        self.text = ""
+        self._speculative = None
+        self._next_inference = int(settings.EMOTION_STREAM_INTERVAL_SECONDS * self.sample_rate)
+
+    def add_audio(self, chunk: bytes) -> None:
+        self.audio.append(chunk)
+        if self.audio.size < self._next_inference:
+            return
+        if self._speculative is not None and not self._speculative[0].done():
+            return
+
+        # Speculative runs only use idle inference slots, never queue
+        task = asyncio.create_task(
+            _infer_emotion(
+                _prepare_emotion_pcm, self.audio.samples(), self.sample_rate, key=self.caller, wait=False
+            )
+        )
+        task.add_done_callback(_discard_result)
+        self._speculative = (task, self.audio.size)
+        self._next_inference = self.audio.size + int(
+            settings.EMOTION_STREAM_INTERVAL_SECONDS * self.sample_rate
+        )
+
+    async def _emotion(self) -> dict:
+        if self._speculative is not None:
+            task, covered = self._speculative
+            stale = (self.audio.size - covered) / self.sample_rate
+            if stale <= settings.EMOTION_STREAM_STALE_SECONDS:
+                try:
+                    return await task
+                except Exception as infer_err:
+                    logger.warning(f"Speculative emotion inference failed: {infer_err}")
+        return await _infer_emotion(
+            _prepare_emotion_pcm, self.audio.samples(), self.sample_rate, key=self.caller
+        )
+
+    async def end_turn(self, message: dict) -> None:
+        try:
+            user_text = (message.get("text") or self.text).strip()
+            if not user_text:
+                await self.send("error", detail="Thiếu 'text' từ frontend STT")
+                return
+            if not self.audio.size:
+                await self.send("error", detail="Audio is empty")
+                return
+
+            logger.info(
+                f"Processing ws turn: text_len={len(user_text)}, audio_seconds={self.audio.seconds:.1f}"
+            )
             try:
-                save_message(
-                    user_id=user_id,
+                emotion_result = await self._emotion()
+            except (admission.Overloaded, admission.TooManyRequests) as shed:
+                await self.send("error", detail=shed.detail, retry_after=shed.retry_after)
+                return
+            except Exception as infer_err:
+                # Report it like /chat/stream does; the session stays open
+                logger.error(f"WebSocket emotion inference failed: {infer_err}", exc_info=True)
+                await self.send("error", detail="Internal server error")
+                return
+            turn = _ChatTurn(
+                user_text,
+                emotion_result["emotion"],
+                emotion_result["confidence"],
+                self.user_id,
+                list(self.history),
+                self.use_cache,
+            )
+            if self.user_id:
+                _queue_message(
+                    user_id=self.user_id,
                     role="user",
                     content=user_text,
-                    emotion=emotion,
-                    confidence=confidence,
+                    emotion=turn.emotion,
+                    confidence=turn.confidence,
                 )
-                logger.info(f"User message saved for {user_id}")
-            except Exception as save_err:
-                logger.error(f"Failed to save user message: {save_err}")
 
-        # Get recent messages for context if logged in
-        recent_messages = []
-        if user_id:
+            reply_text = ""
             try:
-                recent_messages = get_recent_messages(user_id, limit=5)
-            except Exception as fetch_err:
-                logger.warning(f"Failed to fetch recent messages: {fetch_err}")
+                async for event, data in _turn_events(turn):
+                    if event == "done":
+                        reply_text = data["reply_text"]
+                    await self.send(event, **data)
+            except WebSocketDisconnect:
+                raise
+            except Exception as turn_err:
+                logger.error(f"WebSocket turn failed: {turn_err}", exc_info=True)
+                await self.send("error", detail="Internal server error")
 
-        # Chat Response
-        reply_text = chatbot_service.get_reply(
-            user_text=user_text,
-            emotion=emotion,
-            recent_messages=recent_messages if user_id else [],
-        )
+            self.history.append({"role": "user", "content": user_text, "emotion": turn.emotion})
+            if reply_text:
+                self.history.append({"role": "assistant", "content": reply_text, "emotion": None})
+            del self.history[: -settings.CONTEXT_CACHE_TURNS]
+        finally:
+            self._reset()
 
-        # Save assistant reply if logged in
-        if user_id:
-            try:
-                save_message(
-                    user_id=user_id,
-                    role="assistant",
-                    content=reply_text,
-                    emotion=None,
-                    confidence=None,
-                )
-                logger.info(f"Assistant message saved for {user_id}")
-            except Exception as save_err:
-                logger.error(f"Failed to save assistant message: {save_err}")
 
-        logger.info(f"Chat completed: emotion={emotion}, confidence={confidence:.2f}")
+@router.websocket("/chat/ws")
+async def chat_ws(websocket: WebSocket):
+    """
+    Streaming chat session over a WebSocket.
 
-        return ChatResponse(
-            user_text=user_text,
-            reply_text=reply_text,
-            emotion=emotion,
-            confidence=confidence,
-        )
+    Client -> server:
+      {"type": "start", "authorization": "Bearer ...", "sample_rate": 16000,
+       "encoding": "pcm_f32le" | "pcm_s16le", "no_cache": false}   once
+      binary frames of mono PCM audio                              while speaking
+      {"type": "text", "text": "..."}                              partial STT text
+      {"type": "end", "text": "..."}                               end of utterance
 
-    except HTTPException:
-        raise
+    Server -> client: "ready" after start, then per turn the same events as
+    /chat/stream ("emotion", "token"..., "done") as {"type": ..., ...} JSON.
+    Protocol errors are reported as {"type": "error", "detail": ...}.
+    """
+    await websocket.accept()
+    session = _ChatSession(websocket)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("bytes") is not None:
+                if session.audio is None:
+                    await session.send("error", detail="Send a start message first")
+                else:
+                    session.add_audio(message["bytes"])
+                continue
+
+            try:
+                payload = json.loads(message.get("text") or "")
+                kind = payload.get("type")
+            except (ValueError, AttributeError):
+                await session.send("error", detail="Invalid JSON message")
+                continue
+
+            if kind == "start":
+                try:
+                    await session.start(payload)
+                except (TypeError, ValueError) as start_err:
+                    logger.warning(f"Invalid ws start message: {start_err}")
+                    await session.send("error", detail="Invalid start message")
+            elif session.audio is None:
+                await session.send("error", detail="Send a start message first")
+            elif kind == "text":
+                session.text = payload.get("text") or ""
+            elif kind == "end":
+                await session.end_turn(payload)
+            else:
+                await session.send("error", detail=f"Unknown message type: {kind}")
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
-        logger.error(f"Chat endpoint error: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal server error")
+        logger.error(f"Chat websocket error: {e}", exc_info=True)
+        await websocket.close(code=1011)
+
+
+_TTS_FILE = re.compile(r"^tts-[0-9a-f]{32}\.mp3$")
+
+
+@router.get("/tts/{name}")
+async def get_tts_audio(name: str):
+    """
+    Spoken reply from ChatResponse.audio_url; waits while it is still being synthesized.
+    """
+    if not settings.TTS_ENABLED or not _TTS_FILE.match(name):
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    tts = await _tts()
+    if not await tts.wait(name, settings.TTS_WAIT_SECONDS):
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    # Content-addressed, so the file at this URL never changes
+    return FileResponse(
+        services.storage_service.path(name),
+        media_type="audio/mpeg",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
 
 @router.get("/emotion-stats")
 async def get_emotion_stats(
@@ -146,7 +602,7 @@ async def get_emotion_stats(
             raise HTTPException(status_code=401, detail="Authorization header required")
         
         try:
-            user_id = get_user_id_from_token(authorization)
+            user_id = await run_io(get_user_id_from_token, authorization)
         except Exception as auth_err:
             logger.warning(f"Auth failed: {auth_err}")
             raise HTTPException(status_code=401, detail="Invalid token")
@@ -158,7 +614,7 @@ async def get_emotion_stats(
             raise HTTPException(status_code=400, detail="Invalid date format, use YYYY-MM-DD")
         
         # Get emotion stats
-        stats = get_emotion_stats_by_date(user_id, date_param)
+        stats = await run_io(get_emotion_stats_by_date, user_id, date_param)
         
         return stats
         
@@ -166,4 +622,72 @@ async def get_emotion_stats(
         raise
     except Exception as e:
         logger.error(f"Emotion stats endpoint error: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.get("/emotion-stats/range", response_model=EmotionRangeResponse)
+async def get_emotion_stats_range(
+    start: str = Query(..., description="First date (inclusive), YYYY-MM-DD"),
+    end: str = Query(..., description="Last date (inclusive), YYYY-MM-DD"),
+    tz: str = Query(default=settings.DEFAULT_TIMEZONE, description="IANA timezone, e.g. Asia/Ho_Chi_Minh"),
+    granularity: str = Query(default="day", pattern="^(day|hour)$"),
+    authorization: str = Header(default=None),
+):
+    """
+    Get per-day or per-hour emotion counts for a date range in the caller's timezone.
+    """
+    try:
+        if not authorization:
+            raise HTTPException(status_code=401, detail="Authorization header required")
+
+        try:
+            user_id = await run_io(get_user_id_from_token, authorization)
+        except Exception as auth_err:
+            logger.warning(f"Auth failed: {auth_err}")
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+        try:
+            start_date = datetime.strptime(start, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end, "%Y-%m-%d").date()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format, use YYYY-MM-DD")
+        if end_date < start_date:
+            raise HTTPException(status_code=400, detail="end must not be before start")
+
+        try:
+            ZoneInfo(tz)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise HTTPException(status_code=400, detail=f"Unknown timezone: {tz}")
+
+        num_buckets = (end_date - start_date).days + 1
+        if granularity == "hour":
+            num_buckets *= 24
+        if num_buckets > settings.EMOTION_RANGE_MAX_BUCKETS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Range too large (max {settings.EMOTION_RANGE_MAX_BUCKETS} buckets)",
+            )
+
+        buckets = await run_io(
+            get_emotion_histogram, user_id, start_date, end_date, tz, granularity
+        )
+
+        return EmotionRangeResponse(
+            start=start,
+            end=end,
+            timezone=tz,
+            granularity=granularity,
+            buckets=buckets,
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Emotion stats range endpoint error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.get("/stats")
+async def get_service_stats():
+    """Internal statistics: write-behind queue depth, flush latency, caches, admission."""
+    return {**services.stats(), "admission": admission.inference.stats()}
@@ -0,0 +1,84 @@
+"""
+Small in-process caches shared by the services.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with optional per-entry expiry.
+
+    Entries are evicted least-recently-used first once ``maxsize`` is
+    reached, and expire ``ttl`` seconds after being set (an entry may also be
+    given a shorter ttl of its own). Hit/miss counters feed ``stats()``.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[Any, float | None]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Like ``get`` but without touching recency or hit/miss counters."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        value, expires_at = entry
+        return value if expires_at is None or expires_at > time.monotonic() else default
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        if self.ttl is not None:
+            ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl is not None and ttl <= 0:
+            return
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
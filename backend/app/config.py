@@ -21,20 +21,120 @@ class Settings:
     EMOTION_MODEL_PATH: str = "model/whisper.pt"
     EMOTION_LABELS: list = ["happy", "neutral", "sad", "angry"]
 
+    # Inference backend: "torch" (fp32), "int8" (dynamic quantization) or
+    # "onnx" (ONNX Runtime, export with `python -m scripts.export_emotion_onnx`)
+    EMOTION_BACKEND: str = os.getenv("EMOTION_BACKEND", "torch")
+    EMOTION_ONNX_PATH: str = os.getenv("EMOTION_ONNX_PATH", "model/whisper.onnx")
+
+    # Emotion inference micro-batching
+    EMOTION_BATCHING: bool = os.getenv("EMOTION_BATCHING", "true").lower() in ("1", "true", "yes")
+    EMOTION_BATCH_MAX_SIZE: int = int(os.getenv("EMOTION_BATCH_MAX_SIZE", "8"))
+    EMOTION_BATCH_MAX_WAIT_MS: float = float(os.getenv("EMOTION_BATCH_MAX_WAIT_MS", "5"))
+
+    # Feed only the real frames to the encoder instead of padding to 30 s,
+    # batching clips by length bucket (EMOTION_LENGTH_BUCKET_FRAMES, 100 = 1 s).
+    # Check accuracy with scripts/check_trim_parity.py before enabling.
+    EMOTION_TRIM_INPUT: bool = os.getenv("EMOTION_TRIM_INPUT", "false").lower() in ("1", "true", "yes")
+    EMOTION_LENGTH_BUCKET_FRAMES: int = int(os.getenv("EMOTION_LENGTH_BUCKET_FRAMES", "200"))
+
+    # Preprocessing before inference: energy-based VAD drops leading/trailing
+    # silence (frames more than EMOTION_VAD_THRESHOLD_DB below the loudest),
+    # then at most EMOTION_MAX_AUDIO_SECONDS are resampled to 16 kHz
+    EMOTION_VAD_TRIM: bool = os.getenv("EMOTION_VAD_TRIM", "true").lower() in ("1", "true", "yes")
+    EMOTION_VAD_THRESHOLD_DB: float = float(os.getenv("EMOTION_VAD_THRESHOLD_DB", "40"))
+    EMOTION_MAX_AUDIO_SECONDS: float = float(os.getenv("EMOTION_MAX_AUDIO_SECONDS", "30"))
+    # Uploads are decoded block by block and only up to this many seconds
+    EMOTION_MAX_DECODE_SECONDS: float = float(os.getenv("EMOTION_MAX_DECODE_SECONDS", "60"))
+
+    # /chat/ws: run emotion inference on the utterance so far every
+    # EMOTION_STREAM_INTERVAL_SECONDS of new audio; reuse the last run at
+    # end-of-utterance if it misses at most EMOTION_STREAM_STALE_SECONDS
+    EMOTION_STREAM_INTERVAL_SECONDS: float = float(os.getenv("EMOTION_STREAM_INTERVAL_SECONDS", "1.0"))
+    EMOTION_STREAM_STALE_SECONDS: float = float(os.getenv("EMOTION_STREAM_STALE_SECONDS", "0.5"))
+
+    # Cache predictions by a hash of the decoded audio (0 disables). Set
+    # EMOTION_CACHE_PATH to also keep them in a SQLite file across restarts.
+    EMOTION_CACHE_SIZE: int = int(os.getenv("EMOTION_CACHE_SIZE", "4096"))
+    EMOTION_CACHE_PATH: str = os.getenv("EMOTION_CACHE_PATH", "")
+    EMOTION_CACHE_DISK_MAX_ENTRIES: int = int(os.getenv("EMOTION_CACHE_DISK_MAX_ENTRIES", "100000"))
+
+    # Execution pools. Inference threads block while their request waits in
+    # the micro-batcher, so the CPU pool must be at least one batch wide.
+    CPU_POOL_WORKERS: int = int(
+        os.getenv("CPU_POOL_WORKERS", str(max(os.cpu_count() or 1, EMOTION_BATCH_MAX_SIZE)))
+    )
+    IO_POOL_WORKERS: int = int(os.getenv("IO_POOL_WORKERS", "16"))
+
+    # Admission control for emotion inference (app/admission.py): one running
+    # inference per CPU pool worker, at most INFERENCE_QUEUE_MAX waiting (then
+    # 503 + Retry-After) and INFERENCE_PER_USER in flight per caller (then 429;
+    # 0 = unlimited). Once INFERENCE_DEGRADE_QUEUE are waiting, new turns skip
+    # inference and use "neutral" with no confidence (0 disables).
+    INFERENCE_QUEUE_MAX: int = int(os.getenv("INFERENCE_QUEUE_MAX", str(4 * CPU_POOL_WORKERS)))
+    INFERENCE_PER_USER: int = int(os.getenv("INFERENCE_PER_USER", "2"))
+    INFERENCE_DEGRADE_QUEUE: int = int(os.getenv("INFERENCE_DEGRADE_QUEUE", "0"))
+    # Queued work is dropped once this is exceeded; clients may shorten it with
+    # an X-Request-Timeout: <seconds> header
+    REQUEST_DEADLINE_SECONDS: float = float(os.getenv("REQUEST_DEADLINE_SECONDS", "30"))
+
     WHISPER_MODEL: str = "small"
     GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
 
     # LLM config
     LLM_TEMPERATURE: float = 0.7
     LLM_MAX_TOKENS: int = 500
+    GROQ_MODEL: str = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+    GROQ_TIMEOUT_SECONDS: float = float(os.getenv("GROQ_TIMEOUT_SECONDS", "10"))
+    GEMINI_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "15"))
+    # Start the fallback provider if the primary has no answer / first token
+    # after this many ms (0 disables hedging)
+    LLM_HEDGE_DELAY_MS: float = float(os.getenv("LLM_HEDGE_DELAY_MS", "0"))
+    # Skip a provider for LLM_BREAKER_RESET_SECONDS after this many consecutive failures
+    LLM_BREAKER_FAILURES: int = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+    LLM_BREAKER_RESET_SECONDS: float = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
 
     # Audio config
     AUDIO_DIR: str = "audio"
     MAX_AUDIO_SIZE: int = 25 * 1024 * 1024  # 25MB
-    AUDIO_CLEANUP_HOURS: int = 24
+    # Whole request body limit, enforced while the body streams in (audio + form fields)
+    MAX_REQUEST_SIZE: int = MAX_AUDIO_SIZE + 1024 * 1024
+    # Stored TTS files are deleted once unused for AUDIO_CLEANUP_HOURS and,
+    # least recently used first, while the total is over AUDIO_CACHE_MAX_BYTES.
+    # A background janitor checks every AUDIO_JANITOR_INTERVAL_SECONDS (0
+    # disables), deleting AUDIO_JANITOR_BATCH files per step.
+    AUDIO_CLEANUP_HOURS: float = float(os.getenv("AUDIO_CLEANUP_HOURS", "24"))
+    AUDIO_CACHE_MAX_BYTES: int = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    AUDIO_JANITOR_INTERVAL_SECONDS: float = float(os.getenv("AUDIO_JANITOR_INTERVAL_SECONDS", "300"))
+    AUDIO_JANITOR_BATCH: int = int(os.getenv("AUDIO_JANITOR_BATCH", "200"))
+
+    # Server-side TTS (gTTS) of replies: synthesized in the background into
+    # AUDIO_DIR and returned as ChatResponse.audio_url (/tts/<file>), which
+    # waits up to TTS_WAIT_SECONDS for a file that is still being generated
+    TTS_ENABLED: bool = os.getenv("TTS_ENABLED", "false").lower() in ("1", "true", "yes")
+    TTS_LANG: str = os.getenv("TTS_LANG", "vi")
+    TTS_TLD: str = os.getenv("TTS_TLD", "com")
+    TTS_WAIT_SECONDS: float = float(os.getenv("TTS_WAIT_SECONDS", "15"))
 
     # API Keys
     GOOGLE_API_KEY: str = os.getenv("GOOGLE_API_KEY", "")
+    GROQ_API_KEY: str = os.getenv("GROQ_API_KEY", "")
+
+    # Load models and clients in the background at startup; /ready reports 503
+    # until this warmup has finished
+    WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+    # `python main.py` listens on HOST:PORT. With SERVE_WORKERS > 1 the emotion
+    # model is loaded once and the workers are forked from that process
+    # (see app/prefork.py).
+    # Torch threads per worker default to cpu_count // SERVE_WORKERS.
+    HOST: str = os.getenv("HOST", "0.0.0.0")
+    PORT: int = int(os.getenv("PORT", "8000"))
+    SERVE_WORKERS: int = int(os.getenv("SERVE_WORKERS", "1"))
+    TORCH_THREADS_PER_WORKER: int = int(os.getenv("TORCH_THREADS_PER_WORKER", "0"))
+
+    # Expose per-stage latency histograms, queue depths and cache hit rates
+    # on /metrics (Prometheus text format); spans are no-ops when off
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
 
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
@@ -44,6 +144,51 @@ class Settings:
     SUPABASE_ANON_KEY: str = os.getenv("SUPABASE_ANON_KEY", "")
     SUPABASE_SERVICE_ROLE_KEY: str = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
 
+    # Local JWT verification. Set SUPABASE_JWT_SECRET for HS256 projects or
+    # SUPABASE_JWKS_URL (<SUPABASE_URL>/auth/v1/.well-known/jwks.json) for
+    # asymmetric keys; without either, tokens are checked by a call to Supabase.
+    SUPABASE_JWT_SECRET: str = os.getenv("SUPABASE_JWT_SECRET", "")
+    SUPABASE_JWKS_URL: str = os.getenv("SUPABASE_JWKS_URL", "")
+    SUPABASE_JWT_AUDIENCE: str = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+
+    # Verified token -> user_id cache
+    AUTH_CACHE_SIZE: int = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+    AUTH_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+
+    # Write-behind message persistence
+    MESSAGE_FLUSH_SIZE: int = int(os.getenv("MESSAGE_FLUSH_SIZE", "50"))
+    MESSAGE_FLUSH_INTERVAL_MS: float = float(os.getenv("MESSAGE_FLUSH_INTERVAL_MS", "200"))
+    MESSAGE_QUEUE_MAX: int = int(os.getenv("MESSAGE_QUEUE_MAX", "10000"))
+    MESSAGE_FLUSH_MAX_RETRIES: int = int(os.getenv("MESSAGE_FLUSH_MAX_RETRIES", "5"))
+    MESSAGE_DRAIN_TIMEOUT_SECONDS: float = float(os.getenv("MESSAGE_DRAIN_TIMEOUT_SECONDS", "10"))
+
+    # Read /emotion-stats from precomputed daily counters (emotion_daily_stats).
+    # Apply sql/emotion_daily_stats.sql and run scripts.backfill_emotion_rollups first.
+    EMOTION_ROLLUPS_ENABLED: bool = os.getenv("EMOTION_ROLLUPS_ENABLED", "false").lower() in ("1", "true", "yes")
+
+    # /emotion-stats/range: default timezone and max number of buckets per request
+    DEFAULT_TIMEZONE: str = os.getenv("DEFAULT_TIMEZONE", "Asia/Ho_Chi_Minh")
+    EMOTION_RANGE_MAX_BUCKETS: int = int(os.getenv("EMOTION_RANGE_MAX_BUCKETS", "800"))
+
+    # Per-user recent message cache used to build LLM context
+    CONTEXT_CACHE_USERS: int = int(os.getenv("CONTEXT_CACHE_USERS", "5000"))
+    CONTEXT_CACHE_TURNS: int = int(os.getenv("CONTEXT_CACHE_TURNS", "20"))
+    CONTEXT_CACHE_IDLE_SECONDS: float = float(os.getenv("CONTEXT_CACHE_IDLE_SECONDS", "1800"))
+
+    # LLM prompt history: newest turns up to this many estimated tokens. With
+    # LLM_HISTORY_SUMMARY on, older turns are folded into a per-user rolling
+    # summary (one extra background LLM call when turns fall out of the budget)
+    LLM_HISTORY_TOKEN_BUDGET: int = int(os.getenv("LLM_HISTORY_TOKEN_BUDGET", "800"))
+    LLM_HISTORY_SUMMARY: bool = os.getenv("LLM_HISTORY_SUMMARY", "false").lower() in ("1", "true", "yes")
+    LLM_HISTORY_SUMMARY_MAX_TOKENS: int = int(os.getenv("LLM_HISTORY_SUMMARY_MAX_TOKENS", "200"))
+
+    # Reuse LLM replies for short repeated turns: "off", "exact" (text + emotion +
+    # history must match) or "greetings" (only context-free greetings/thanks)
+    REPLY_CACHE_MODE: str = os.getenv("REPLY_CACHE_MODE", "off").lower()
+    REPLY_CACHE_SIZE: int = int(os.getenv("REPLY_CACHE_SIZE", "2048"))
+    REPLY_CACHE_TTL_SECONDS: float = float(os.getenv("REPLY_CACHE_TTL_SECONDS", "3600"))
+    REPLY_CACHE_MAX_CHARS: int = int(os.getenv("REPLY_CACHE_MAX_CHARS", "40"))
+
     # Default user (for anonymous saves). Must exist in auth.users if foreign key is enforced.
     DEFAULT_USER_ID: str | None = os.getenv("DEFAULT_USER_ID")
 
@@ -1,13 +1,18 @@
 """Supabase client setup with validation."""
 
 import logging
-from supabase import create_client
+import threading
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+_client = None
+_client_lock = threading.Lock()
+
 
 def _init_client():
+    from supabase import create_client
+
     if not settings.SUPABASE_URL:
         raise RuntimeError("SUPABASE_URL is not configured")
 
@@ -25,4 +30,11 @@ def _init_client():
     return client
 
 
-supabase = _init_client()
+def get_supabase():
+    """Return the shared Supabase client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _init_client()
+    return _client
@@ -0,0 +1,71 @@
+"""
+Bounded thread pools for running blocking work off the asyncio event loop.
+
+CPU-bound work (emotion inference) and network-bound work (Supabase, LLM
+calls) get separate pools so a burst of one cannot starve the other, and
+neither ever blocks the event loop serving lightweight endpoints.
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_cpu_pool: ThreadPoolExecutor | None = None
+_io_pool: ThreadPoolExecutor | None = None
+
+
+def _get_cpu_pool() -> ThreadPoolExecutor:
+    global _cpu_pool
+    with _lock:
+        if _cpu_pool is None:
+            _cpu_pool = ThreadPoolExecutor(
+                max_workers=settings.CPU_POOL_WORKERS, thread_name_prefix="cpu"
+            )
+        return _cpu_pool
+
+
+def _get_io_pool() -> ThreadPoolExecutor:
+    global _io_pool
+    with _lock:
+        if _io_pool is None:
+            _io_pool = ThreadPoolExecutor(
+                max_workers=settings.IO_POOL_WORKERS, thread_name_prefix="io"
+            )
+        return _io_pool
+
+
+async def run_cpu(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a CPU-bound callable in the dedicated inference pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_cpu_pool(), functools.partial(func, *args, **kwargs))
+
+
+async def run_io(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking network call (Supabase, LLM) in the I/O pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_io_pool(), functools.partial(func, *args, **kwargs))
+
+
+def queue_depths() -> dict[str, int]:
+    """Number of calls waiting for a free worker in each started pool."""
+    pools = {"cpu_pool": _cpu_pool, "io_pool": _io_pool}
+    return {name: pool._work_queue.qsize() for name, pool in pools.items() if pool is not None}
+
+
+def shutdown(wait: bool = True) -> None:
+    """Shut down both pools; they are recreated lazily if used again."""
+    global _cpu_pool, _io_pool
+    with _lock:
+        pools = [pool for pool in (_cpu_pool, _io_pool) if pool is not None]
+        _cpu_pool = _io_pool = None
+    for pool in pools:
+        pool.shutdown(wait=wait)
+    logger.info("Executor pools shut down")
@@ -0,0 +1,235 @@
+"""
+Minimal Prometheus-style metrics: histograms, counters and gauges rendered
+in the text exposition format on /metrics.
+
+With METRICS_ENABLED off, ``span`` returns a shared no-op context manager
+and ``observe``/``inc`` return immediately, so instrumented code pays one
+attribute check per call.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, Iterable
+
+from app.config import settings
+
+# Seconds; covers sub-millisecond cache hits up to slow LLM replies
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NOOP = nullcontext()
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        if not settings.METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in values]
+
+
+class Gauge(_Metric):
+    """Gauge set directly, or computed at scrape time by ``callback``.
+
+    The callback returns ``{label_values_tuple: value}``.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        callback: Callable[[], dict[tuple[str, ...], float]] | None = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        if not settings.METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> list[str]:
+        if self.callback is not None:
+            values = sorted(self.callback().items())
+        else:
+            with self._lock:
+                values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in values]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not settings.METRICS_ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+
+        lines = []
+        for labels, counts, total, count in sorted(snapshot):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                label_str = _format_labels(self.labelnames, labels, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{label_str} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {total}")
+            lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, self.stage)
+        return False
+
+
+def span(stage: str):
+    """Time a block of (sync or async) code into ``stage_duration_seconds``."""
+    if not settings.METRICS_ENABLED:
+        return _NOOP
+    return _Span(stage)
+
+
+_registry: list[_Metric] = []
+
+
+def register(metric: _Metric) -> _Metric:
+    _registry.append(metric)
+    return metric
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.header())
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = register(
+    Histogram("stage_duration_seconds", "Time spent in each processing stage.", ["stage"])
+)
+HTTP_REQUEST_SECONDS = register(
+    Histogram("http_request_duration_seconds", "HTTP request latency by route.", ["method", "route", "status"])
+)
+HTTP_IN_FLIGHT = register(Gauge("http_requests_in_flight", "Requests currently being served."))
+LLM_REQUESTS = register(
+    Counter("llm_requests_total", "LLM provider calls by outcome.", ["provider", "outcome"])
+)
+ADMISSIONS = register(
+    Counter("inference_admissions_total", "Emotion inference admission decisions.", ["outcome"])
+)
+BATCH_SIZE = register(
+    Histogram(
+        "emotion_batch_size",
+        "Number of clips per emotion model forward pass.",
+        buckets=(1, 2, 3, 4, 6, 8, 12, 16, 32),
+    )
+)
+
+
+def _queue_depths() -> dict[tuple[str, ...], float]:
+    from app import admission, executor, services
+
+    depths = {(pool,): float(depth) for pool, depth in executor.queue_depths().items()}
+    depths[("inference_admission",)] = float(admission.inference.queued)
+    message_writer = services._loaded("message_writer")
+    if message_writer is not None:
+        depths[("message_writer",)] = float(message_writer.stats()["queue_depth"])
+    return depths
+
+
+def _cache_hit_ratios() -> dict[tuple[str, ...], float]:
+    from app import services
+    from app.services import auth
+
+    ratios = {("auth_token",): auth.token_cache_stats()["hit_rate"]}
+
+    def walk(prefix: str, stats: dict) -> None:
+        for name, value in stats.items():
+            if isinstance(value, dict):
+                walk(name, value)
+            elif name == "hit_rate":
+                ratios[(prefix,)] = float(value)
+
+    walk("", services.stats())
+    return ratios
+
+
+register(Gauge("queue_depth", "Items waiting in executor pools and write-behind queues.", ["queue"], _queue_depths))
+register(Gauge("cache_hit_ratio", "Hit ratio of in-process caches since start.", ["cache"], _cache_hit_ratios))
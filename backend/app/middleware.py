@@ -0,0 +1,131 @@
+"""
+ASGI middleware.
+"""
+
+import json
+import time
+
+from starlette.exceptions import HTTPException
+
+from app import metrics
+from app.config import settings
+
+
+class _BodyTooLarge(HTTPException):
+    """413 raised from ``receive``.
+
+    Subclasses HTTPException so FastAPI's body parsing re-raises it instead
+    of turning it into a generic 400.
+    """
+
+    def __init__(self, detail: str):
+        super().__init__(status_code=413, detail=detail)
+
+
+class BodySizeLimitMiddleware:
+    """Reject request bodies larger than ``max_body_size`` bytes with 413.
+
+    A declared Content-Length over the limit is refused before anything is
+    read. Otherwise (e.g. chunked uploads) bytes are counted as they are
+    received and the request is aborted as soon as the limit is crossed, so
+    an oversized upload is never fully buffered or spooled to disk.
+    """
+
+    def __init__(self, app, max_body_size: int):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    @property
+    def detail(self) -> str:
+        return f"Request quá lớn (max {self.max_body_size / (1024*1024):.0f}MB)"
+
+    async def _reject(self, send) -> None:
+        body = json.dumps({"detail": self.detail}, ensure_ascii=False).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"connection", b"close"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > self.max_body_size:
+                    await self._reject(send)
+                    return
+                break
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise _BodyTooLarge(self.detail)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            if not response_started:
+                await self._reject(send)
+
+
+class MetricsMiddleware:
+    """Record request latency by route template and the in-flight count."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def status_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, status_send)
+        finally:
+            metrics.HTTP_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope; the template
+            # keeps label cardinality bounded
+            route = scope.get("route")
+            metrics.HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            )
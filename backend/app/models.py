@@ -3,7 +3,7 @@ Pydantic models for request/response validation.
 """
 
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 
 class ChatResponse(BaseModel):
@@ -12,6 +12,25 @@ class ChatResponse(BaseModel):
     reply_text: str
     emotion: str
     confidence: Optional[float] = None
+    audio_url: Optional[str] = None
+
+
+class EmotionBucket(BaseModel):
+    """Emotion counts for one day or hour."""
+    start: str
+    happy: int
+    neutral: int
+    sad: int
+    angry: int
+
+
+class EmotionRangeResponse(BaseModel):
+    """Emotion histogram over a date range."""
+    start: str
+    end: str
+    timezone: str
+    granularity: str
+    buckets: List[EmotionBucket]
 
 
 class HealthResponse(BaseModel):
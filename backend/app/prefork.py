@@ -0,0 +1,142 @@
+"""
+Pre-fork serving: load the emotion model once, then fork uvicorn workers.
+
+The parent process imports the app, loads the classifier weights and binds
+the listening socket, then forks ``workers`` children that all accept on
+that socket. Weights are shared copy-on-write (they are never written after
+loading, and ``gc.freeze`` keeps the collector from touching the parent's
+objects), so each extra worker costs its activations and Python heap
+rather than another copy of the model.
+
+Each child gets its own torch intra-op thread allotment so workers do not
+oversubscribe the CPUs. Everything that owns threads, sockets or an event
+loop (executor pools, the micro-batcher, LLM clients, the Supabase client,
+the emotion cache's SQLite handle) is created lazily and therefore only
+ever inside a worker.
+"""
+
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _preload() -> None:
+    """Load the emotion model in the parent so workers inherit it."""
+    if settings.EMOTION_BACKEND == "onnx":
+        # onnxruntime starts its thread pool when the session is created,
+        # which does not survive fork(); each worker loads its own session
+        logger.info("ONNX backend: model is loaded per worker, not preloaded")
+        return
+
+    import torch
+
+    # Keep the parent single-threaded so no OpenMP pool exists at fork time
+    torch.set_num_threads(1)
+
+    from app import services
+
+    start = time.perf_counter()
+    # First access imports the service module, which loads the model
+    _ = services.emotion_service
+    logger.info(f"Emotion model preloaded in {time.perf_counter() - start:.2f}s")
+
+
+def _worker_threads(workers: int) -> int:
+    if settings.TORCH_THREADS_PER_WORKER > 0:
+        return settings.TORCH_THREADS_PER_WORKER
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def _run_worker(app, sock: socket.socket, threads: int, log_level: str) -> None:
+    """Body of a forked child; never returns."""
+    # Default signal handling: uvicorn installs its own graceful handlers
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    import torch
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already fixed by earlier inter-op work
+
+    code = 0
+    try:
+        config = uvicorn.Config(app, log_level=log_level)
+        uvicorn.Server(config).run(sockets=[sock])
+    except BaseException:
+        logger.exception(f"Worker {os.getpid()} crashed")
+        code = 1
+    finally:
+        os._exit(code)
+
+
+def serve(app, host: str, port: int, workers: int, log_level: str = "info") -> None:
+    """Run ``app`` in ``workers`` forked processes sharing one socket.
+
+    Workers that die are replaced (forked again from the preloaded parent).
+    SIGINT/SIGTERM are forwarded to the workers, which shut down gracefully.
+    """
+    _preload()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    threads = _worker_threads(workers)
+    logger.info(f"Serving on {host}:{port} with {workers} workers x {threads} torch threads")
+
+    # Move everything allocated so far out of the collector's reach, so
+    # GC passes in the children do not write to (and copy) shared pages
+    gc.collect()
+    gc.freeze()
+
+    children: set[int] = set()
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(app, sock, threads, log_level)
+        children.add(pid)
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            logger.warning(f"Worker {pid} exited with status {status}, restarting")
+            time.sleep(1)
+            spawn()
+
+    sock.close()
+    logger.info("All workers stopped")
@@ -1,13 +1,89 @@
 """
 Services package.
+
+Service singletons are imported lazily on first attribute access so that
+importing the app does not pull in torch, transformers or the LLM SDKs.
+Call ``warmup()`` to load them ahead of the first request.
 """
 
-from app.services.emotion import emotion_service
-from app.services.chatbot import chatbot_service
-from app.services.storage import storage_service
+import importlib
+import sys
+
+_SERVICE_MODULES = {
+    "emotion_service": "app.services.emotion",
+    "chatbot_service": "app.services.chatbot",
+    "storage_service": "app.services.storage",
+    "message_writer": "app.services.message_writer",
+    "conversation_cache": "app.services.context_cache",
+    "tts_service": "app.services.tts",
+}
 
 __all__ = [
     "emotion_service",
     "chatbot_service",
     "storage_service",
+    "message_writer",
+    "conversation_cache",
+    "tts_service",
+    "warmup",
+    "shutdown",
+    "stats",
 ]
+
+
+def __getattr__(name: str):
+    module_name = _SERVICE_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name), name)
+
+
+def _loaded(name: str):
+    """Return a service singleton only if its module has been imported."""
+    module = sys.modules.get(_SERVICE_MODULES[name])
+    return getattr(module, name, None) if module is not None else None
+
+
+def warmup() -> None:
+    """Load every service and run one emotion inference."""
+    from app.config import settings
+
+    __getattr__("storage_service")
+    __getattr__("chatbot_service")
+    if settings.TTS_ENABLED:
+        __getattr__("tts_service")
+    __getattr__("emotion_service").warmup()
+
+
+def shutdown() -> None:
+    """Release resources held by services that were loaded."""
+    from app.config import settings
+
+    message_writer = _loaded("message_writer")
+    if message_writer is not None:
+        message_writer.close(timeout=settings.MESSAGE_DRAIN_TIMEOUT_SECONDS)
+
+    emotion_service = _loaded("emotion_service")
+    if emotion_service is not None:
+        emotion_service.close()
+
+
+def stats() -> dict:
+    """Queue and cache statistics of the services that are loaded."""
+    result = {}
+    message_writer = _loaded("message_writer")
+    if message_writer is not None:
+        result["message_writer"] = message_writer.stats()
+    conversation_cache = _loaded("conversation_cache")
+    if conversation_cache is not None:
+        result["conversation_cache"] = conversation_cache.stats()
+    emotion_service = _loaded("emotion_service")
+    if emotion_service is not None and emotion_service.result_cache is not None:
+        result["emotion_cache"] = emotion_service.result_cache.stats()
+    chatbot_service = _loaded("chatbot_service")
+    if chatbot_service is not None:
+        result["chatbot"] = chatbot_service.stats()
+    tts_service = _loaded("tts_service")
+    if tts_service is not None:
+        result["tts"] = tts_service.stats()
+    return result
@@ -0,0 +1,160 @@
+"""
+Block-wise decoding of uploaded audio into mono float32 samples.
+
+WAV, FLAC and OGG (Vorbis/Opus) go through libsndfile via ``soundfile``;
+WebM (what browsers' MediaRecorder produces) goes through PyAV. Both read the
+source file a block at a time and stop after ``max_seconds``, so peak memory
+is bounded by the decoded window, not by the upload size. ``PcmBuffer``
+collects raw PCM streamed by WebSocket clients.
+"""
+
+import logging
+from typing import BinaryIO
+
+import numpy as np
+import soundfile as sf
+
+logger = logging.getLogger(__name__)
+
+# Accepted upload content types (parameters such as ";codecs=opus" are ignored)
+AUDIO_CONTENT_TYPES = frozenset(
+    {
+        "audio/wav",
+        "audio/x-wav",
+        "audio/wave",
+        "audio/vnd.wave",
+        "audio/flac",
+        "audio/x-flac",
+        "audio/ogg",
+        "audio/opus",
+        "application/ogg",
+        "audio/webm",
+        "video/webm",
+    }
+)
+
+BLOCK_FRAMES = 16384
+
+
+def is_supported_content_type(content_type: str | None) -> bool:
+    return (content_type or "").split(";")[0].strip().lower() in AUDIO_CONTENT_TYPES
+
+
+def _concat(chunks: list[np.ndarray]) -> np.ndarray:
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+
+
+def _decode_soundfile(source: BinaryIO, max_seconds: float | None) -> tuple[np.ndarray, int]:
+    with sf.SoundFile(source) as audio:
+        sr = audio.samplerate
+        frames = int(max_seconds * sr) if max_seconds else -1
+        chunks = [
+            block.mean(axis=1, dtype=np.float32) if block.shape[1] > 1 else block[:, 0]
+            for block in audio.blocks(
+                blocksize=BLOCK_FRAMES, frames=frames, dtype="float32", always_2d=True
+            )
+        ]
+    return _concat(chunks), sr
+
+
+def _decode_av(source: BinaryIO, max_seconds: float | None) -> tuple[np.ndarray, int]:
+    try:
+        import av
+    except ImportError as exc:
+        raise RuntimeError("Decoding this format requires PyAV (pip install av)") from exc
+
+    with av.open(source, mode="r") as container:
+        stream = container.streams.audio[0]
+        sr = stream.rate or stream.codec_context.sample_rate
+        # Let FFmpeg do the mono mixdown while decoding
+        resampler = av.AudioResampler(format="flt", layout="mono", rate=sr)
+        limit = int(max_seconds * sr) if max_seconds else None
+
+        chunks, total = [], 0
+        for frame in container.decode(stream):
+            for out in resampler.resample(frame):
+                samples = out.to_ndarray().reshape(-1)
+                chunks.append(samples)
+                total += samples.shape[0]
+            if limit is not None and total >= limit:
+                break
+        else:
+            for out in resampler.resample(None):
+                chunks.append(out.to_ndarray().reshape(-1))
+
+    data = _concat(chunks)
+    return (data[:limit] if limit is not None else data), sr
+
+
+def decode_audio(source: BinaryIO, max_seconds: float | None = None) -> tuple[np.ndarray, int]:
+    """Decode an audio file object into mono float32 samples and their rate.
+
+    Only the first ``max_seconds`` are decoded when given.
+    """
+    start = source.tell()
+    try:
+        return _decode_soundfile(source, max_seconds)
+    except sf.LibsndfileError as exc:
+        # Not a container libsndfile understands (e.g. WebM): try FFmpeg
+        logger.debug("libsndfile could not decode upload (%s), trying PyAV", exc)
+        source.seek(start)
+        return _decode_av(source, max_seconds)
+
+
+# Raw PCM encodings accepted from streaming clients
+PCM_DTYPES = {"pcm_f32le": np.dtype("<f4"), "pcm_s16le": np.dtype("<i2")}
+
+
+class PcmBuffer:
+    """Growable mono float32 buffer for raw PCM streamed in chunks.
+
+    Storage is preallocated in doubling steps up to ``max_seconds``; audio
+    past that is dropped (and counted), matching the upload decode limit.
+    Chunks need not end on a sample boundary: a trailing partial sample is
+    kept and completed by the next chunk.
+    """
+
+    def __init__(self, sample_rate: int, encoding: str = "pcm_f32le", max_seconds: float = 60.0):
+        if encoding not in PCM_DTYPES:
+            raise ValueError(f"Unknown encoding {encoding!r}, expected one of {tuple(PCM_DTYPES)}")
+        self.sample_rate = sample_rate
+        self.dtype = PCM_DTYPES[encoding]
+        self.capacity = int(max_seconds * sample_rate)
+        self.size = 0
+        self.dropped = 0
+        # Bytes of a sample split across chunks
+        self._partial = b""
+        self._data = np.empty(min(self.capacity, sample_rate * 4), dtype=np.float32)
+
+    def append(self, chunk: bytes) -> None:
+        if self._partial:
+            chunk = self._partial + chunk
+        usable = len(chunk) - len(chunk) % self.dtype.itemsize
+        self._partial = bytes(chunk[usable:])
+        samples = np.frombuffer(chunk, dtype=self.dtype, count=usable // self.dtype.itemsize)
+        if self.dtype.kind == "i":
+            samples = samples / np.float32(32768.0)
+
+        room = self.capacity - self.size
+        if samples.shape[0] > room:
+            self.dropped += samples.shape[0] - room
+            samples = samples[:room]
+        end = self.size + samples.shape[0]
+        if end > self._data.shape[0]:
+            grown = np.empty(min(self.capacity, max(end, self._data.shape[0] * 2)), dtype=np.float32)
+            grown[: self.size] = self._data[: self.size]
+            self._data = grown
+        self._data[self.size : end] = samples
+        self.size = end
+
+    def samples(self) -> np.ndarray:
+        """Copy of the buffered audio (safe to hand to another thread)."""
+        return self._data[: self.size].copy()
+
+    @property
+    def seconds(self) -> float:
+        return self.size / self.sample_rate
+
+    def clear(self) -> None:
+        self.size = 0
+        self.dropped = 0
@@ -0,0 +1,84 @@
+"""
+Vectorized audio preprocessing ahead of emotion inference.
+
+Everything here works on whole NumPy arrays; there are no per-sample Python
+loops, so a 30 s clip takes a few milliseconds.
+"""
+
+import numpy as np
+
+TARGET_SAMPLE_RATE = 16000
+
+
+def resample(data: np.ndarray, sr: int, target_sr: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Band-limited resampling of mono float32 samples via the real FFT.
+
+    Frequencies above the new Nyquist are dropped (the anti-alias filter) and
+    the spectrum is transformed back at the target length. Handles both
+    down- and up-sampling and arbitrary rate ratios (44.1 kHz -> 16 kHz).
+    """
+    if sr == target_sr or data.size == 0:
+        return data
+    new_len = max(1, int(round(data.shape[0] * target_sr / sr)))
+    spectrum = np.fft.rfft(data)
+    resampled = np.fft.irfft(spectrum[: new_len // 2 + 1], n=new_len)
+    return (resampled * (new_len / data.shape[0])).astype(np.float32, copy=False)
+
+
+def frame_energy_db(data: np.ndarray, frame_len: int) -> np.ndarray:
+    """RMS level in dBFS of consecutive non-overlapping frames."""
+    num_frames = -(-data.shape[0] // frame_len)
+    padded = np.zeros(num_frames * frame_len, dtype=np.float32)
+    padded[: data.shape[0]] = data
+    frames = padded.reshape(num_frames, frame_len)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1e-10))
+
+
+def trim_silence(
+    data: np.ndarray,
+    sr: int,
+    threshold_db: float = 40.0,
+    floor_db: float = -60.0,
+    frame_ms: float = 20.0,
+    margin_ms: float = 200.0,
+) -> np.ndarray:
+    """Cut leading and trailing silence with an energy-based VAD.
+
+    A frame counts as voiced when it is within ``threshold_db`` of the
+    loudest frame and above ``floor_db`` dBFS. Everything before the first
+    and after the last voiced frame is dropped, keeping ``margin_ms`` of
+    context on each side. Clips with no voiced frame are returned unchanged.
+    """
+    frame_len = max(1, int(sr * frame_ms / 1000))
+    energy = frame_energy_db(data, frame_len)
+    if energy.size == 0:
+        return data
+
+    voiced = np.flatnonzero(energy >= max(energy.max() - threshold_db, floor_db))
+    if voiced.size == 0:
+        return data
+
+    margin = int(sr * margin_ms / 1000)
+    start = max(0, voiced[0] * frame_len - margin)
+    end = min(data.shape[0], (voiced[-1] + 1) * frame_len + margin)
+    return data[start:end]
+
+
+def preprocess(
+    data: np.ndarray,
+    sr: int,
+    trim: bool = True,
+    threshold_db: float = 40.0,
+    max_seconds: float = 30.0,
+) -> np.ndarray:
+    """Trim silence, cap the analyzed window and resample to 16 kHz.
+
+    Trimming and capping happen at the source rate, so the resampler only
+    sees the samples that are actually analyzed.
+    """
+    if trim:
+        data = trim_silence(data, sr, threshold_db=threshold_db)
+    if max_seconds:
+        data = data[: int(sr * max_seconds)]
+    return resample(np.ascontiguousarray(data, dtype=np.float32), sr)
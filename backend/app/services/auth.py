@@ -1,11 +1,108 @@
-from app.db import supabase
+"""Resolve Supabase access tokens to user ids."""
+
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from app import metrics
+from app.cache import TTLCache
+from app.config import settings
+from app.db import get_supabase
+
+logger = logging.getLogger(__name__)
+
+# token hash -> user_id, each entry capped at the token's own expiry
+_token_cache = TTLCache(
+    maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL_SECONDS
+)
+
+_jwks_client = None
+_jwks_lock = threading.Lock()
+
+
+def _get_jwks_client():
+    global _jwks_client
+    if _jwks_client is None:
+        with _jwks_lock:
+            if _jwks_client is None:
+                import jwt
+
+                _jwks_client = jwt.PyJWKClient(settings.SUPABASE_JWKS_URL, cache_keys=True)
+    return _jwks_client
+
+
+def _signing_key(token: str, alg: str | None):
+    """Return the key to verify this token locally, or None if not configured."""
+    if alg == "HS256" and settings.SUPABASE_JWT_SECRET:
+        return settings.SUPABASE_JWT_SECRET
+    if alg in ("RS256", "ES256") and settings.SUPABASE_JWKS_URL:
+        return _get_jwks_client().get_signing_key_from_jwt(token).key
+    return None
+
+
+def _unverified_exp(token: str) -> float | None:
+    """Read the exp claim without verifying (token already checked remotely)."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except Exception:
+        return None
+
+
+def _verify_remote(token: str) -> tuple[str, float | None]:
+    res = get_supabase().auth.get_user(token)
+    if not res.user:
+        raise RuntimeError("Invalid token")
+
+    return res.user.id, _unverified_exp(token)
+
+
+def _verify(token: str) -> tuple[str, float | None]:
+    """Verify signature, expiry and audience locally when a key is configured."""
+    if not (settings.SUPABASE_JWT_SECRET or settings.SUPABASE_JWKS_URL):
+        return _verify_remote(token)
+
+    import jwt
+
+    try:
+        alg = jwt.get_unverified_header(token).get("alg")
+        key = _signing_key(token, alg)
+        if key is None:
+            return _verify_remote(token)
+
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[alg],
+            audience=settings.SUPABASE_JWT_AUDIENCE,
+            options={"require": ["exp", "sub"]},
+        )
+    except jwt.PyJWTError as exc:
+        raise RuntimeError(f"Invalid token: {exc}") from exc
+
+    return claims["sub"], float(claims["exp"])
+
+
+def token_cache_stats() -> dict:
+    return _token_cache.stats()
+
 
 def get_user_id_from_token(token: str) -> str:
     if token.lower().startswith("bearer "):
         token = token[7:]
 
-    res = supabase.auth.get_user(token)
-    if not res.user:
-        raise RuntimeError("Invalid token")
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+    user_id = _token_cache.get(cache_key)
+    if user_id is not None:
+        return user_id
+
+    with metrics.span("auth"):
+        user_id, exp = _verify(token)
 
-    return res.user.id
+    ttl = exp - time.time() if exp is not None else None
+    _token_cache.set(cache_key, user_id, ttl=ttl)
+    return user_id
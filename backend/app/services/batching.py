@@ -0,0 +1,116 @@
+"""
+Dynamic micro-batching for model inference.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Group concurrent single-item requests into one batched call.
+
+    Callers submit one item and wait on the returned future. A background
+    thread collects items until ``max_batch_size`` are waiting or the oldest
+    one has waited ``max_wait_ms``, then hands the whole list to ``batch_fn``,
+    which must return one result per item in the same order.
+
+    If ``key_fn`` is given, items are only batched with others sharing the
+    same key (e.g. inputs of the same length bucket).
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[list[Any]], list[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        key_fn: Callable[[Any], Hashable] | None = None,
+        name: str = "micro-batcher",
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.key_fn = key_fn
+        self.name = name
+
+        self._pending: dict[Hashable, list[tuple[Any, Future, float]]] = {}
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+
+    def submit(self, item: Any) -> Future:
+        """Queue an item and return a future resolving to its result."""
+        key = self.key_fn(item) if self.key_fn is not None else None
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} is closed")
+            # Start lazily so no thread exists until the first request.
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._pending.setdefault(key, []).append((item, future, time.monotonic()))
+            self._cond.notify()
+        return future
+
+    def close(self, timeout: float | None = None) -> None:
+        """Stop accepting work and wait for queued items to be processed."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _next_batch(self) -> list[tuple[Any, Future, float]] | None:
+        with self._cond:
+            while True:
+                if not self._pending:
+                    if self._closed:
+                        return None
+                    self._cond.wait()
+                    continue
+
+                # A full bucket goes first; otherwise the one with the oldest item
+                key = next(
+                    (k for k, queue in self._pending.items() if len(queue) >= self.max_batch_size),
+                    None,
+                )
+                if key is None:
+                    key = min(self._pending, key=lambda k: self._pending[k][0][2])
+                    remaining = self._pending[key][0][2] + self.max_wait - time.monotonic()
+                    if remaining > 0 and not self._closed:
+                        self._cond.wait(remaining)
+                        continue
+
+                queue = self._pending[key]
+                batch = queue[: self.max_batch_size]
+                del queue[: self.max_batch_size]
+                if not queue:
+                    del self._pending[key]
+                return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            # Skip items whose callers already gave up
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self.batch_fn([item for item, _, _ in batch])
+            except Exception as exc:
+                logger.error("%s batch of %d failed: %s", self.name, len(batch), exc)
+                for _, future, _ in batch:
+                    future.set_exception(exc)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
@@ -1,12 +1,33 @@
 """Utilities for persisting chat messages."""
 
 import logging
-from datetime import date, datetime, timedelta
-from app.db import supabase
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from app import metrics
+from app.config import settings
+from app.db import get_supabase
+from app.services import emotion_rollups
+from app.services.context_cache import conversation_cache
+from app.services.message_writer import message_writer
 
 logger = logging.getLogger(__name__)
 
 
+def _context_message(row: dict) -> dict:
+    """The fields of a message row kept in the conversation cache."""
+    return {
+        "role": row["role"],
+        "content": row["content"],
+        "emotion": row["emotion"],
+        "created_at": row["created_at"],
+    }
+
+
+def _remember(row: dict) -> None:
+    """Add a saved row to the user's cached conversation, if cached."""
+    conversation_cache.append(row["user_id"], _context_message(row))
+
+
 def save_message(
     user_id: str,
     role: str,
@@ -18,20 +39,48 @@ def save_message(
     if not user_id:
         raise ValueError("user_id is required to save a message")
 
+    row = {
+        "user_id": user_id,
+        "role": role,
+        "content": content,
+        "emotion": emotion,
+        "confidence": confidence,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
     try:
-        return supabase.table("messages").insert(
-            {
-                "user_id": user_id,
-                "role": role,
-                "content": content,
-                "emotion": emotion,
-                "confidence": confidence,
-            }
-        ).execute()
+        with metrics.span("db_insert_message"):
+            result = get_supabase().table("messages").insert(row).execute()
     except Exception as exc:
         logger.error("Failed to save message to Supabase: %s", exc, exc_info=True)
         raise
 
+    _remember(row)
+    if settings.EMOTION_ROLLUPS_ENABLED:
+        emotion_rollups.record_messages([row])
+    return result
+
+
+def enqueue_message(
+    user_id: str,
+    role: str,
+    content: str,
+    emotion: str | None = None,
+    confidence: float | None = None,
+) -> None:
+    """Queue a message row for write-behind insertion into the messages table."""
+    if not user_id:
+        raise ValueError("user_id is required to save a message")
+
+    row = {
+        "user_id": user_id,
+        "role": role,
+        "content": content,
+        "emotion": emotion,
+        "confidence": confidence,
+    }
+    message_writer.enqueue(row)
+    _remember(row)
+
 
 def get_recent_messages(user_id: str, limit: int = 5) -> list[dict]:
     """Get the most recent messages for a user.
@@ -45,23 +94,38 @@ def get_recent_messages(user_id: str, limit: int = 5) -> list[dict]:
     """
     if not user_id:
         raise ValueError("user_id is required to fetch messages")
-    
+
+    cached = conversation_cache.get(user_id, limit)
+    if cached is not None:
+        return cached
+
+    # Messages saved from here on are merged into the loaded buffer. Rows
+    # still queued for writing are read first: one flushed in between is
+    # then in both (and deduplicated) rather than in neither.
+    conversation_cache.begin_load(user_id)
+    unsaved = [_context_message(row) for row in message_writer.pending(user_id)]
     try:
-        response = (
-            supabase.table("messages")
-            .select("role, content, emotion, created_at")
-            .eq("user_id", user_id)
-            .order("created_at", desc=True)
-            .limit(limit)
-            .execute()
-        )
-        
-        # Return reversed so oldest message is first
-        return list(reversed(response.data)) if response.data else []
+        # Fetch a full buffer's worth so later turns are served from cache
+        with metrics.span("history_fetch"):
+            response = (
+                get_supabase().table("messages")
+                .select("role, content, emotion, created_at")
+                .eq("user_id", user_id)
+                .order("created_at", desc=True)
+                .limit(max(limit, conversation_cache.max_turns))
+                .execute()
+            )
     except Exception as exc:
+        conversation_cache.abort_load(user_id)
         logger.error("Failed to fetch recent messages: %s", exc, exc_info=True)
         return []
 
+    # Reverse so oldest message is first
+    messages = list(reversed(response.data)) if response.data else []
+    messages = conversation_cache.load(user_id, messages, unsaved)
+    return messages[-limit:] if limit > 0 else []
+
+
 def get_emotion_stats_by_date(user_id: str, target_date: date | str) -> dict:
     """Get emotion statistics for a specific date.
     
@@ -80,7 +144,13 @@ def get_emotion_stats_by_date(user_id: str, target_date: date | str) -> dict:
         target_date = datetime.strptime(target_date, "%Y-%m-%d").date()
     elif isinstance(target_date, datetime):
         target_date = target_date.date()
-    
+
+    if settings.EMOTION_ROLLUPS_ENABLED:
+        try:
+            return emotion_rollups.get_daily_stats(user_id, target_date)
+        except Exception as exc:
+            logger.warning("Emotion rollup read failed, scanning messages: %s", exc)
+
     try:
         # Define date range (start and end of day)
         start_of_day = datetime.combine(target_date, datetime.min.time()).isoformat() + "Z"
@@ -88,7 +158,7 @@ def get_emotion_stats_by_date(user_id: str, target_date: date | str) -> dict:
         
         # Query messages for the date with emotion field
         response = (
-            supabase.table("messages")
+            get_supabase().table("messages")
             .select("emotion")
             .eq("user_id", user_id)
             .gte("created_at", start_of_day)
@@ -114,4 +184,122 @@ def get_emotion_stats_by_date(user_id: str, target_date: date | str) -> dict:
         return emotion_counts
     except Exception as exc:
         logger.error("Failed to fetch emotion stats: %s", exc, exc_info=True)
-        return {"happy": 0, "neutral": 0, "sad": 0, "angry": 0}
\ No newline at end of file
+        return {"happy": 0, "neutral": 0, "sad": 0, "angry": 0}
+
+
+def _histogram_buckets(
+    start: date, end: date, tz: ZoneInfo, granularity: str
+) -> list[datetime]:
+    """Local (naive) bucket start times covering [start, end] inclusive."""
+    if granularity == "day":
+        return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+    # Step in UTC so DST transitions yield the real local hours
+    first = datetime.combine(start, datetime.min.time(), tz).astimezone(timezone.utc)
+    last = datetime.combine(end + timedelta(days=1), datetime.min.time(), tz).astimezone(timezone.utc)
+    hours = int((last - first).total_seconds() // 3600)
+    buckets = []
+    for i in range(hours):
+        local = (first + timedelta(hours=i)).astimezone(tz).replace(tzinfo=None)
+        if not buckets or buckets[-1] != local:
+            buckets.append(local)
+    return buckets
+
+
+def _scan_histogram(
+    user_id: str, start_utc: datetime, end_utc: datetime, tz: ZoneInfo, granularity: str
+) -> dict[tuple, int]:
+    """Fallback: count (bucket, emotion) in one paged pass over the messages."""
+    counts: dict[tuple, int] = {}
+    page_size = 1000
+    offset = 0
+    while True:
+        response = (
+            get_supabase().table("messages")
+            .select("emotion, created_at")
+            .eq("user_id", user_id)
+            .gte("created_at", start_utc.isoformat())
+            .lt("created_at", end_utc.isoformat())
+            .order("created_at")
+            .range(offset, offset + page_size - 1)
+            .execute()
+        )
+        rows = response.data or []
+        for row in rows:
+            emotion = (row.get("emotion") or "").lower()
+            if not emotion:
+                continue
+            local = datetime.fromisoformat(row["created_at"].replace("Z", "+00:00")).astimezone(tz)
+            if granularity == "day":
+                bucket = local.date()
+            else:
+                bucket = local.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+            counts[(bucket, emotion)] = counts.get((bucket, emotion), 0) + 1
+        if len(rows) < page_size:
+            return counts
+        offset += page_size
+
+
+def get_emotion_histogram(
+    user_id: str,
+    start: date,
+    end: date,
+    tz_name: str,
+    granularity: str = "day",
+) -> list[dict]:
+    """Get per-day or per-hour emotion counts for [start, end] in a timezone.
+
+    Args:
+        user_id: User ID to fetch messages for
+        start: First local date (inclusive)
+        end: Last local date (inclusive)
+        tz_name: IANA timezone the day/hour boundaries are computed in
+        granularity: "day" or "hour"
+
+    Returns:
+        One dict per bucket, oldest first:
+        {"start": ISO datetime with offset, "happy": int, "neutral": int, "sad": int, "angry": int}
+    """
+    if not user_id:
+        raise ValueError("user_id is required to fetch emotion stats")
+    if granularity not in ("day", "hour"):
+        raise ValueError("granularity must be 'day' or 'hour'")
+
+    tz = ZoneInfo(tz_name)
+    start_utc = datetime.combine(start, datetime.min.time(), tz).astimezone(timezone.utc)
+    end_utc = datetime.combine(end + timedelta(days=1), datetime.min.time(), tz).astimezone(timezone.utc)
+
+    try:
+        # Grouped in the database: one row per (bucket, emotion)
+        response = get_supabase().rpc(
+            "emotion_histogram",
+            {
+                "p_user_id": user_id,
+                "p_start": start_utc.isoformat(),
+                "p_end": end_utc.isoformat(),
+                "p_tz": tz_name,
+                "p_granularity": granularity,
+            },
+        ).execute()
+        counts = {}
+        for row in response.data or []:
+            bucket = datetime.fromisoformat(row["bucket"])
+            key = bucket.date() if granularity == "day" else bucket
+            counts[(key, (row["emotion"] or "").lower())] = int(row["count"])
+    except Exception as exc:
+        logger.warning("emotion_histogram RPC failed, scanning messages: %s", exc)
+        counts = _scan_histogram(user_id, start_utc, end_utc, tz, granularity)
+
+    histogram = []
+    for bucket in _histogram_buckets(start, end, tz, granularity):
+        if granularity == "day":
+            bucket_start = datetime.combine(bucket, datetime.min.time(), tz)
+        else:
+            bucket_start = bucket.replace(tzinfo=tz)
+        histogram.append(
+            {
+                "start": bucket_start.isoformat(),
+                **{emotion: counts.get((bucket, emotion), 0) for emotion in emotion_rollups.EMOTIONS},
+            }
+        )
+    return histogram
@@ -1,87 +1,183 @@
-import os
-import warnings
+import asyncio
 import logging
-from groq import Groq
-import google.generativeai as genai
+from typing import AsyncIterator
+from app import metrics
 from app.config import settings
+from app.services.llm_providers import GeminiProvider, GroqProvider, ProviderPool
+from app.services.prompt_context import HistorySummaries, estimate_tokens, fit_history
+from app.services.reply_cache import reply_cache
 
-warnings.filterwarnings("ignore", category=FutureWarning, module="google.generativeai")
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = (
+    "Bạn là chatbot giao tiếp bằng giọng nói. "
+    "Trả lời hoàn toàn bằng tiếng Việt, ngắn gọn, tự nhiên, thân thiện. "
+    "Điều chỉnh giọng điệu phù hợp với trạng thái người dùng. "
+    "KHÔNG nói tên cảm xúc, KHÔNG phán xét."
+)
+
+SUMMARY_PROMPT = (
+    "Tóm tắt cuộc trò chuyện dưới đây bằng tiếng Việt trong vài câu ngắn: "
+    "các sự kiện, mong muốn và cảm xúc chính của người dùng. Chỉ trả về bản tóm tắt."
+)
+
+BUSY_REPLY = "Hệ thống đang bận chút xíu."
+
+
 class ChatbotService:
     def __init__(self):
         """Khởi tạo Groq làm model chính, Gemini làm fallback."""
 
-        groq_api_key = os.getenv("GROQ_API_KEY")
-        self.groq_model = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
-        self.groq_client = Groq(api_key=groq_api_key) if groq_api_key else None
-
-    def get_reply(self, user_text: str, emotion: str = "neutral", recent_messages: list[dict] | None = None) -> str:
+        providers = []
+        if settings.GROQ_API_KEY:
+            providers.append(
+                GroqProvider(settings.GROQ_API_KEY, settings.GROQ_MODEL, settings.GROQ_TIMEOUT_SECONDS)
+            )
+        if settings.GOOGLE_API_KEY:
+            providers.append(
+                GeminiProvider(
+                    settings.GOOGLE_API_KEY,
+                    settings.GEMINI_MODEL,
+                    settings.GEMINI_TIMEOUT_SECONDS,
+                    system_instruction=SYSTEM_PROMPT,
+                )
+            )
+        if not providers:
+            logger.warning("No LLM provider configured (set GROQ_API_KEY and/or GOOGLE_API_KEY)")
+
+        self.pool = ProviderPool(providers, hedge_delay_ms=settings.LLM_HEDGE_DELAY_MS)
+        self.summaries = HistorySummaries(settings.CONTEXT_CACHE_USERS, settings.CONTEXT_CACHE_IDLE_SECONDS)
+        self._summary_tasks: set[asyncio.Task] = set()
+
+    def _select_history(
+        self, user_id: str | None, recent_messages: list[dict] | None
+    ) -> tuple[str | None, list[dict]]:
+        """Keep the newest turns that fit LLM_HISTORY_TOKEN_BUDGET.
+
+        With LLM_HISTORY_SUMMARY on, older turns are covered by the user's
+        cached rolling summary, refreshed in the background so the current
+        turn never waits for it.
+        """
+        older, kept = fit_history(recent_messages or [], settings.LLM_HISTORY_TOKEN_BUDGET)
+        if not (settings.LLM_HISTORY_SUMMARY and user_id):
+            return None, kept
+
+        if older and self.summaries.pending(user_id, older)[1] and self.summaries.begin(user_id):
+            task = asyncio.create_task(self._refresh_summary(user_id, older))
+            self._summary_tasks.add(task)
+            task.add_done_callback(self._summary_tasks.discard)
+        return self.summaries.get(user_id), kept
+
+    async def _refresh_summary(self, user_id: str, older: list[dict]) -> None:
         try:
-            history_messages = []
-            if recent_messages:
-                limited_messages = recent_messages[-10:]
-                for msg in limited_messages:
-                    role = "assistant" if msg.get("role") != "user" else "user"
-                    history_messages.append({"role": role, "content": msg.get("content", "")})
-
-            system_prompt = (
-                "Bạn là chatbot giao tiếp bằng giọng nói. "
-                "Trả lời hoàn toàn bằng tiếng Việt, ngắn gọn, tự nhiên, thân thiện. "
-                "Điều chỉnh giọng điệu phù hợp với trạng thái người dùng. "
-                "KHÔNG nói tên cảm xúc, KHÔNG phán xét."
+            previous, new_turns = self.summaries.pending(user_id, older)
+            transcript = "\n".join(
+                f"{'Người dùng' if msg.get('role') == 'user' else 'Trợ lý'}: {msg.get('content', '')}"
+                for msg in new_turns
             )
-
-            user_prompt = (
-                f"Ngữ cảnh cảm xúc (ẩn, không được nhắc): {emotion}\n"
-                f"Người dùng nói: \"{user_text}\""
+            if previous:
+                transcript = f"Tóm tắt trước đó: {previous}\n{transcript}"
+            summary = await self.pool.complete(
+                [{"role": "system", "content": SUMMARY_PROMPT}, {"role": "user", "content": transcript}]
             )
 
-            messages = [{"role": "system", "content": system_prompt}] + history_messages + [
-                {"role": "user", "content": user_prompt}
-            ]
-
-            completion = self.groq_client.chat.completions.create(
-                model=self.groq_model,
-                messages=messages,
-                temperature=settings.LLM_TEMPERATURE,
-                max_tokens=settings.LLM_MAX_TOKENS,
+            # Keep the summary inside its share of the prompt
+            words = summary.split()
+            while words and estimate_tokens(" ".join(words)) > settings.LLM_HISTORY_SUMMARY_MAX_TOKENS:
+                words = words[: int(len(words) * 0.9)]
+            self.summaries.store(user_id, " ".join(words), older)
+        except Exception as exc:
+            logger.warning("History summary failed for user %s: %s", user_id, exc)
+        finally:
+            self.summaries.end(user_id)
+
+    def _build_messages(
+        self, user_text: str, emotion: str, history: list[dict], summary: str | None = None
+    ) -> list[dict]:
+        history_messages = []
+        if summary:
+            history_messages.append(
+                {"role": "system", "content": f"Tóm tắt các lượt trò chuyện trước: {summary}"}
             )
+        for msg in history:
+            role = "assistant" if msg.get("role") != "user" else "user"
+            history_messages.append({"role": role, "content": msg.get("content", "")})
+
+        user_prompt = (
+            f"Ngữ cảnh cảm xúc (ẩn, không được nhắc): {emotion}\n"
+            f"Người dùng nói: \"{user_text}\""
+        )
+
+        return [{"role": "system", "content": SYSTEM_PROMPT}] + history_messages + [
+            {"role": "user", "content": user_prompt}
+        ]
+
+    async def get_reply(
+        self,
+        user_text: str,
+        emotion: str = "neutral",
+        recent_messages: list[dict] | None = None,
+        use_cache: bool = True,
+        user_id: str | None = None,
+    ) -> str:
+        summary, history = self._select_history(user_id, recent_messages)
+        messages = self._build_messages(user_text, emotion, history, summary)
+        cache_key = reply_cache.key(user_text, emotion, messages[1:-1]) if use_cache else None
+        cached = reply_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-            reply_text = (completion.choices[0].message.content or "").strip()
-            if reply_text:
-                return reply_text
-
-            raise RuntimeError("Groq trả về rỗng")
-
-        except Exception as groq_err:
-            logger.error("Groq error, fallback to Gemini if enabled: %s", groq_err, exc_info=True)
-
-            if not self.gemini_enabled:
-                return "Hệ thống đang bận chút xíu."
-
-            try:
-                dynamic_instruction = (
-                    "Bạn là chatbot giao tiếp bằng giọng nói tiếng Việt. "
-                    "Quy tắc: Trả lời cực ngắn (dưới 2 câu), không emoji. "
-                    f"Người dùng đang cảm thấy: '{emotion}'. Điều chỉnh giọng điệu phù hợp."
-                )
-
-                model = genai.GenerativeModel(
-                    model_name=self.model_name,
-                    system_instruction=dynamic_instruction,
-                    generation_config=self.generation_config,
-                    safety_settings=self.safety_settings,
-                )
-
-                chat = model.start_chat(history=[])
-                response = chat.send_message(user_text)
-                reply_text = (response.text or "").strip()
-                return reply_text if reply_text else "Xin lỗi, tôi chưa nghe rõ."
+        try:
+            with metrics.span("llm_reply"):
+                reply = await self.pool.complete(messages)
+        except Exception as llm_err:
+            logger.error("LLM error: %s", llm_err)
+            return BUSY_REPLY
+
+        reply_cache.set(cache_key, reply)
+        return reply
+
+    async def stream_reply(
+        self,
+        user_text: str,
+        emotion: str = "neutral",
+        recent_messages: list[dict] | None = None,
+        use_cache: bool = True,
+        user_id: str | None = None,
+    ) -> AsyncIterator[str]:
+        """Yield reply text chunks as the LLM generates them.
+
+        A cached reply is yielded as a single chunk. If every provider fails
+        before producing anything, yields the busy reply instead.
+        """
+        summary, history = self._select_history(user_id, recent_messages)
+        messages = self._build_messages(user_text, emotion, history, summary)
+        cache_key = reply_cache.key(user_text, emotion, messages[1:-1]) if use_cache else None
+        cached = reply_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        try:
+            async for chunk in self.pool.stream(messages):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as llm_err:
+            logger.error("LLM stream error: %s", llm_err)
+            if not chunks:
+                yield BUSY_REPLY
+            return
+
+        reply_cache.set(cache_key, "".join(chunks).strip())
+
+    def stats(self) -> dict:
+        return {
+            "providers": self.pool.stats(),
+            "reply_cache": reply_cache.stats(),
+            "history_summaries": self.summaries.stats(),
+        }
 
-            except Exception as gemini_err:
-                logger.error("Gemini fallback error: %s", gemini_err, exc_info=True)
-                return "Hệ thống đang bận chút xíu."
 
 chatbot_service = ChatbotService()
 
@@ -0,0 +1,118 @@
+"""
+In-process cache of each user's most recent messages.
+"""
+
+import threading
+from collections import deque
+from datetime import datetime
+
+from app.cache import TTLCache
+from app.config import settings
+
+
+class ConversationCache:
+    """Per-user ring buffer of recent messages.
+
+    A user's buffer is filled from the database on first access and then kept
+    current by every message this process saves, so building LLM context does
+    not need a query on the hot path. Users are evicted least-recently-used
+    once ``max_users`` is reached, or after ``idle_ttl`` seconds without
+    access; each buffer holds at most ``max_turns`` messages.
+
+    Messages saved while a user's buffer is being loaded are recorded and
+    merged into it (see ``begin_load``), so a load racing a save cannot lose
+    the message. Messages written by other worker processes are not seen
+    until the user's buffer is evicted and reloaded.
+    """
+
+    def __init__(self, max_users: int = 5000, max_turns: int = 20, idle_ttl: float = 1800.0):
+        self.max_turns = max_turns
+        self._users = TTLCache(maxsize=max_users, ttl=idle_ttl)
+        self._lock = threading.Lock()
+        # user id -> [loads in progress, messages appended meanwhile]
+        self._loading: dict[str, list] = {}
+
+    def get(self, user_id: str, limit: int) -> list[dict] | None:
+        """Return the last ``limit`` messages (oldest first), or None on a miss."""
+        if limit > self.max_turns:
+            return None
+        buffer = self._users.get(user_id)
+        if buffer is None:
+            return None
+        # Re-set to restart the idle timer
+        self._users.set(user_id, buffer)
+        with self._lock:
+            return list(buffer)[-limit:] if limit > 0 else []
+
+    def begin_load(self, user_id: str) -> None:
+        """Start recording appends for a user whose buffer is about to be loaded.
+
+        Must be followed by ``load`` or ``abort_load``.
+        """
+        with self._lock:
+            self._loading.setdefault(user_id, [0, []])[0] += 1
+
+    def _end_load(self, user_id: str) -> list[dict]:
+        # Caller holds self._lock
+        entry = self._loading[user_id]
+        entry[0] -= 1
+        if not entry[0]:
+            del self._loading[user_id]
+        return entry[1]
+
+    def abort_load(self, user_id: str) -> None:
+        with self._lock:
+            self._end_load(user_id)
+
+    def load(self, user_id: str, messages: list[dict], unsaved: list[dict] | None = None) -> list[dict]:
+        """Seed a user's buffer and return its messages (oldest first).
+
+        ``messages`` is the database snapshot and ``unsaved`` rows that were
+        still queued for writing when it was taken; both are merged with the
+        messages appended since ``begin_load``, ordered by ``created_at``.
+        """
+        with self._lock:
+            appended = self._end_load(user_id)
+            buffer = self._users.peek(user_id)
+            if buffer is not None:
+                # Loaded by a concurrent request meanwhile
+                return list(buffer)
+            merged = _merge(messages, unsaved or [], appended)
+            self._users.set(user_id, deque(merged[-self.max_turns :], maxlen=self.max_turns))
+            return merged
+
+    def append(self, user_id: str, message: dict) -> None:
+        """Record a newly saved message if the user's buffer is cached or loading."""
+        with self._lock:
+            buffer = self._users.peek(user_id)
+            if buffer is not None:
+                buffer.append(message)
+            elif user_id in self._loading:
+                self._loading[user_id][1].append(message)
+
+    def stats(self) -> dict:
+        return self._users.stats()
+
+
+def _timestamp(message: dict) -> float:
+    try:
+        return datetime.fromisoformat(message["created_at"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+
+
+def _merge(*sources: list[dict]) -> list[dict]:
+    """Messages from all sources, oldest first, without duplicates."""
+    merged = {}
+    for message in (m for source in sources for m in source):
+        key = (_timestamp(message), message.get("role"), message.get("content"))
+        merged.setdefault(key, message)
+    return [merged[key] for key in sorted(merged, key=lambda k: k[0])]
+
+
+# Singleton instance
+conversation_cache = ConversationCache(
+    max_users=settings.CONTEXT_CACHE_USERS,
+    max_turns=settings.CONTEXT_CACHE_TURNS,
+    idle_ttl=settings.CONTEXT_CACHE_IDLE_SECONDS,
+)
@@ -1,16 +1,53 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from transformers import WhisperModel, WhisperFeatureExtractor
+from transformers import WhisperConfig, WhisperFeatureExtractor, WhisperModel
+from transformers.models.whisper.modeling_whisper import WhisperEncoder
 import numpy as np
-import soundfile as sf
 import io
+import os
+import logging
+from typing import BinaryIO
+
+from app import metrics
+from app.services.audio_decode import decode_audio
+from app.services.audio_preprocess import TARGET_SAMPLE_RATE, preprocess
+from app.services.batching import MicroBatcher
+from app.services.emotion_cache import EmotionResultCache
+from app.services.emotion_backends import (
+    BACKENDS,
+    OnnxBackend,
+    QuantizedTorchBackend,
+    TorchBackend,
+)
+
+logger = logging.getLogger(__name__)
+
+# Whisper encodes at most 30 s of audio: 3000 mel frames -> 1500 positions
+MAX_FRAMES = 3000
+
+# Encoder hyper-parameters of openai/whisper-tiny
+WHISPER_TINY_CONFIG = {
+    "num_mel_bins": 80,
+    "d_model": 384,
+    "encoder_layers": 4,
+    "encoder_attention_heads": 6,
+    "encoder_ffn_dim": 1536,
+    "max_source_positions": 1500,
+    "activation_function": "gelu",
+    "attn_implementation": "sdpa",
+}
 
 
 class WhisperAttentionClassifier(nn.Module):
-    def __init__(self, num_labels=4):
+    def __init__(self, num_labels=4, pretrained_encoder=False):
         super().__init__()
-        self.encoder = WhisperModel.from_pretrained("openai/whisper-tiny").encoder
+        if pretrained_encoder:
+            self.encoder = WhisperModel.from_pretrained("openai/whisper-tiny").encoder
+        else:
+            # Same architecture built from a local config, no hub download;
+            # the weights come from the fine-tuned state dict anyway
+            self.encoder = WhisperEncoder(WhisperConfig(**WHISPER_TINY_CONFIG))
 
         hidden_size = 384  # whisper-tiny
 
@@ -25,11 +62,48 @@ class WhisperAttentionClassifier(nn.Module):
             nn.Linear(128, num_labels),
         )
 
-    def forward(self, input_features, labels=None):
-        out = self.encoder(input_features=input_features)
-        hidden = out.last_hidden_state  # [B, T, 384]
+    def _encode_variable(self, input_features, attention_mask=None):
+        """Run the encoder on inputs shorter than the 3000 frames Whisper expects.
+
+        Mirrors ``WhisperEncoder.forward`` but slices the positional embedding
+        to the actual length and masks padded positions in self-attention.
+        """
+        encoder = self.encoder
+        hidden = F.gelu(encoder.conv1(input_features))
+        hidden = F.gelu(encoder.conv2(hidden)).permute(0, 2, 1)  # [B, T, 384]
+        hidden = hidden + encoder.embed_positions.weight[: hidden.shape[1]]
+
+        layer_mask = None
+        if attention_mask is not None:
+            # Additive mask [B, 1, T, T] hiding padded keys from every query
+            keys = attention_mask[:, None, None, :].to(hidden.dtype)
+            layer_mask = (1.0 - keys) * torch.finfo(hidden.dtype).min
+            layer_mask = layer_mask.expand(-1, 1, hidden.shape[1], -1)
+
+        for layer in encoder.layers:
+            out = layer(hidden, layer_mask, layer_head_mask=None)
+            hidden = out[0] if isinstance(out, tuple) else out
+
+        return encoder.layer_norm(hidden)
+
+    def forward(self, input_features, labels=None, attention_mask=None):
+        """
+        input_features: [B, 80, F] log-mel features, F = 3000 for padded input
+        attention_mask: optional [B, F] bool mask of real (non-padded) frames
+        """
+        frame_mask = None
+        if attention_mask is None and input_features.shape[-1] == 3000:
+            out = self.encoder(input_features=input_features)
+            hidden = out.last_hidden_state  # [B, T, 384]
+        else:
+            if attention_mask is not None:
+                frame_mask = attention_mask[:, ::2].bool()  # conv2 has stride 2
+            hidden = self._encode_variable(input_features, frame_mask)
 
         attn_scores = self.attn_query(hidden)  # [B, T, 1]
+        if frame_mask is not None:
+            # Padded positions never get weight in the pooling softmax
+            attn_scores = attn_scores.masked_fill(~frame_mask[..., None], float("-inf"))
         attn_weights = F.softmax(attn_scores, dim=1)  # [B, T, 1]
 
         context = (attn_weights * hidden).sum(dim=1)  # [B, 384]
@@ -43,6 +117,22 @@ class WhisperAttentionClassifier(nn.Module):
         return {"logits": logits, "loss": loss}
 
 
+def load_classifier(model_path: str, num_labels: int, device: torch.device) -> WhisperAttentionClassifier:
+    """Build the classifier and load the fine-tuned state dict in eval mode.
+
+    The module is created on the meta device (no random init) and the
+    weights are memory-mapped and assigned in place, so loading costs
+    neither an extra copy nor a pass over the file up front.
+    """
+    with torch.device("meta"):
+        model = WhisperAttentionClassifier(num_labels=num_labels)
+
+    state_dict = torch.load(model_path, map_location=device, mmap=True, weights_only=True)
+    model.load_state_dict(state_dict, assign=True)
+
+    return model.eval()
+
+
 class EmotionModel:
     def __init__(self):
         from app.config import settings
@@ -50,51 +140,211 @@ class EmotionModel:
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.labels = settings.EMOTION_LABELS
 
-        self.model = WhisperAttentionClassifier(num_labels=len(self.labels)).to(
-            self.device
+        # Backend suy luận: torch (fp32), int8 (dynamic quantization) hoặc onnx
+        self.backend = self._create_backend(settings)
+        logger.info("Emotion model using %s backend", self.backend.name)
+
+        # Feature extractor của Whisper
+        # (tham số mặc định trùng với openai/whisper-tiny, không cần tải về)
+        self.feature_extractor = WhisperFeatureExtractor()
+
+        # Chỉ đưa vào encoder số frame thật thay vì pad tới 30s (3000 frame)
+        self.trim_input = settings.EMOTION_TRIM_INPUT
+        self.bucket_frames = settings.EMOTION_LENGTH_BUCKET_FRAMES
+
+        # Tiền xử lý: cắt khoảng lặng (VAD theo năng lượng), giới hạn độ dài,
+        # resample về 16 kHz
+        self.vad_trim = settings.EMOTION_VAD_TRIM
+        self.vad_threshold_db = settings.EMOTION_VAD_THRESHOLD_DB
+        self.max_seconds = settings.EMOTION_MAX_AUDIO_SECONDS
+        # Giải mã dư ra một chút để VAD còn cắt được khoảng lặng ở đầu
+        self.max_decode_seconds = settings.EMOTION_MAX_DECODE_SECONDS
+
+        # Cache kết quả theo nội dung PCM đã giải mã (client hay gửi lại
+        # cùng một đoạn ghi âm khi retry)
+        self.result_cache = None
+        if settings.EMOTION_CACHE_SIZE > 0:
+            self.result_cache = EmotionResultCache(
+                namespace=self._model_tag(settings),
+                maxsize=settings.EMOTION_CACHE_SIZE,
+                path=settings.EMOTION_CACHE_PATH or None,
+                disk_max_entries=settings.EMOTION_CACHE_DISK_MAX_ENTRIES,
+            )
+
+        # Gom các request đồng thời thành một batch; ở chế độ trim,
+        # chỉ gom các clip cùng bucket độ dài
+        self.batcher = None
+        if settings.EMOTION_BATCHING:
+            self.batcher = MicroBatcher(
+                self._predict_batch,
+                max_batch_size=settings.EMOTION_BATCH_MAX_SIZE,
+                max_wait_ms=settings.EMOTION_BATCH_MAX_WAIT_MS,
+                key_fn=lambda item: item[0].shape[-1],
+                name="emotion-batcher",
+            )
+
+    def _create_backend(self, settings):
+        name = settings.EMOTION_BACKEND
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown EMOTION_BACKEND {name!r}, expected one of {BACKENDS}")
+
+        if name == "onnx":
+            if os.path.exists(settings.EMOTION_ONNX_PATH):
+                return OnnxBackend(settings.EMOTION_ONNX_PATH)
+            logger.error(
+                "ONNX model not found at %s (run scripts.export_emotion_onnx), "
+                "falling back to torch backend",
+                settings.EMOTION_ONNX_PATH,
+            )
+            name = "torch"
+
+        model = load_classifier(settings.EMOTION_MODEL_PATH, len(self.labels), self.device)
+        if name == "int8":
+            return QuantizedTorchBackend(model, self.device)
+        return TorchBackend(model, self.device)
+
+    def _model_tag(self, settings) -> str:
+        """Identify the loaded weights, so cached results from another model are ignored."""
+        path = settings.EMOTION_ONNX_PATH if self.backend.name == "onnx" else settings.EMOTION_MODEL_PATH
+        try:
+            return f"{self.backend.name}-{int(os.path.getmtime(path))}"
+        except OSError:
+            return self.backend.name
+
+    def _preprocess(self, data: np.ndarray, sr: int) -> np.ndarray:
+        """Trim silence, cap the length and resample mono samples to 16 kHz."""
+        return preprocess(
+            data,
+            sr,
+            trim=self.vad_trim,
+            threshold_db=self.vad_threshold_db,
+            max_seconds=self.max_seconds,
         )
 
-        state_dict = torch.load(settings.EMOTION_MODEL_PATH, map_location=self.device)
-        self.model.load_state_dict(state_dict)
+    def _extract_features(self, data: np.ndarray, sr: int) -> tuple[torch.Tensor, int]:
+        """Turn mono samples into Whisper log-mel features.
 
-        self.model.eval()
+        Returns ``(features, num_frames)``: padded features of shape
+        [80, 3000], or in trim mode [80, F] with F rounded up to the length
+        bucket, plus the number of real frames.
+        """
+        # 3. Feature extraction
+        if not self.trim_input:
+            inputs = self.feature_extractor(data, sampling_rate=sr, return_tensors="pt")
+            features = inputs.input_features[0]
+            return features, features.shape[-1]
 
-        # Feature extractor của Whisper
-        self.feature_extractor = WhisperFeatureExtractor.from_pretrained(
-            "openai/whisper-tiny"
+        inputs = self.feature_extractor(
+            data, sampling_rate=sr, padding="longest", return_tensors="pt"
         )
+        features = inputs.input_features[0][:, :MAX_FRAMES]
+        num_frames = max(features.shape[-1], 2)
+
+        # Round up to the bucket size, padding with the clip's silence level
+        bucket = min(MAX_FRAMES, -(-num_frames // self.bucket_frames) * self.bucket_frames)
+        features = F.pad(features, (0, bucket - features.shape[-1]), value=features.min().item())
+        return features, num_frames
+
+    def _predict_batch(self, items: list[tuple[torch.Tensor, int]]) -> list[dict]:
+        """Run one forward pass over same-length ``(features, num_frames)`` items."""
+        input_features = torch.stack([features for features, _ in items])
 
-    @torch.no_grad()
-    def predict(self, audio_bytes: bytes):
+        attention_mask = None
+        if self.trim_input:
+            lengths = torch.tensor([num_frames for _, num_frames in items])
+            attention_mask = torch.arange(input_features.shape[-1])[None, :] < lengths[:, None]
+
+        metrics.BATCH_SIZE.observe(len(items))
+        with metrics.span("model_forward"):
+            logits = self.backend(input_features, attention_mask)
+        probs = torch.softmax(logits, dim=-1)
+        confidences, pred_ids = probs.max(dim=-1)
+
+        return [
+            {
+                "emotion": self.labels[pred_id],
+                "confidence": confidence,
+            }
+            for pred_id, confidence in zip(pred_ids.tolist(), confidences.tolist())
+        ]
+
+    def prepare_upload(self, audio: bytes | BinaryIO) -> tuple[np.ndarray, str | None, dict | None]:
+        """Decode an upload, then ``prepare`` it.
+
+        audio: WAV/FLAC/OGG/WebM bytes or a binary file object (e.g. an upload)
         """
-        audio_bytes: WAV audio bytes
+        try:
+            # 1. Giải mã từng block, chỉ đọc tối đa max_decode_seconds
+            source = io.BytesIO(audio) if isinstance(audio, (bytes, bytearray)) else audio
+            with metrics.span("audio_decode"):
+                data, sr = decode_audio(source, self.max_decode_seconds)
+        except Exception as e:
+            raise RuntimeError(f"Emotion detection error: {str(e)}")
+        return self.prepare(data, sr)
+
+    def prepare(self, data: np.ndarray, sr: int) -> tuple[np.ndarray, str | None, dict | None]:
+        """Preprocess mono samples and look them up in the result cache.
+
+        Cheap next to ``infer``, so callers can answer cache hits without
+        waiting for an inference slot. Returns ``(samples at 16 kHz,
+        cache key, cached result or None)``.
         """
         try:
-            # 1. Đọc audio từ bytes
-            data, sr = sf.read(io.BytesIO(audio_bytes), dtype="float32")
+            # 2. Cắt khoảng lặng, giới hạn độ dài, resample
+            with metrics.span("audio_preprocess"):
+                data = self._preprocess(data, sr)
 
-            # 2. Force mono
-            if data.ndim > 1:
-                data = np.mean(data, axis=1)
+            if self.result_cache is None:
+                return data, None, None
+            variant = "trim" if self.trim_input else "pad"
+            cache_key = self.result_cache.key(data, TARGET_SAMPLE_RATE, variant)
+            return data, cache_key, self.result_cache.get(cache_key)
+        except Exception as e:
+            raise RuntimeError(f"Emotion detection error: {str(e)}")
 
-            # 3. Feature extraction
-            inputs = self.feature_extractor(data, sampling_rate=sr, return_tensors="pt")
-            input_features = inputs.input_features.to(self.device)
+    def infer(self, data: np.ndarray, cache_key: str | None = None) -> dict:
+        """Run the model on samples from ``prepare`` and cache the result."""
+        try:
+            with metrics.span("feature_extraction"):
+                item = self._extract_features(data, TARGET_SAMPLE_RATE)
 
             # 4. Predict
-            outputs = self.model(input_features)
-            logits = outputs["logits"]
+            if self.batcher is not None:
+                result = self.batcher.submit(item).result()
+            else:
+                result = self._predict_batch([item])[0]
 
-            probs = torch.softmax(logits, dim=-1)[0]
-            pred_id = torch.argmax(probs).item()
-
-            return {
-                "emotion": self.labels[pred_id],
-                "confidence": probs[pred_id].item(),
-            }
+            if cache_key is not None:
+                self.result_cache.set(cache_key, result)
+            return result
         except Exception as e:
             raise RuntimeError(f"Emotion detection error: {str(e)}")
 
+    def predict(self, audio: bytes | BinaryIO):
+        """
+        audio: WAV/FLAC/OGG/WebM bytes or a binary file object (e.g. an upload)
+        """
+        data, cache_key, cached = self.prepare_upload(audio)
+        return cached if cached is not None else self.infer(data, cache_key)
+
+    def predict_pcm(self, data: np.ndarray, sr: int):
+        """
+        data: mono float32 samples at sample rate ``sr``
+        """
+        data, cache_key, cached = self.prepare(data, sr)
+        return cached if cached is not None else self.infer(data, cache_key)
+
+    def warmup(self) -> None:
+        """Run one inference on a second of silence to initialise kernels."""
+        self.predict_pcm(np.zeros(16000, dtype=np.float32), 16000)
+
+    def close(self) -> None:
+        """Flush pending batched requests and stop the batching thread."""
+        if self.batcher is not None:
+            self.batcher.close()
+        if self.result_cache is not None:
+            self.result_cache.close()
+
 
 # Singleton instance
 emotion_service = EmotionModel()
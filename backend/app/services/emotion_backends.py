@@ -0,0 +1,122 @@
+"""
+Inference backends for the emotion classifier.
+
+Each backend takes a batch of log-mel features ``[B, 80, F]`` plus an
+optional ``[B, F]`` frame mask and returns logits ``[B, num_labels]`` as a
+torch tensor, so EmotionModel can swap them without touching pre/post
+processing. Select one with the EMOTION_BACKEND setting.
+"""
+
+import logging
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "int8", "onnx")
+
+
+class TorchBackend:
+    """Plain fp32 PyTorch module."""
+
+    name = "torch"
+
+    def __init__(self, model: nn.Module, device: torch.device):
+        self.model = model
+        self.device = device
+
+    @torch.no_grad()
+    def __call__(self, input_features: torch.Tensor, attention_mask: torch.Tensor | None = None):
+        input_features = input_features.to(self.device)
+        if attention_mask is not None:
+            attention_mask = attention_mask.to(self.device)
+        return self.model(input_features, attention_mask=attention_mask)["logits"]
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """PyTorch module with Linear layers dynamically quantized to int8 (CPU only)."""
+
+    name = "int8"
+
+    def __init__(self, model: nn.Module, device: torch.device):
+        model = torch.ao.quantization.quantize_dynamic(
+            model.to("cpu"), {nn.Linear}, dtype=torch.qint8
+        )
+        super().__init__(model, torch.device("cpu"))
+
+
+class OnnxBackend:
+    """ONNX Runtime session over a model produced by ``export_onnx``."""
+
+    name = "onnx"
+
+    def __init__(self, path: str, num_threads: int = 0):
+        try:
+            import onnxruntime as ort
+        except ImportError as exc:
+            raise RuntimeError(
+                "EMOTION_BACKEND=onnx requires the onnxruntime package"
+            ) from exc
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, input_features: torch.Tensor, attention_mask: torch.Tensor | None = None):
+        if attention_mask is None:
+            attention_mask = torch.ones(
+                input_features.shape[0], input_features.shape[-1], dtype=torch.bool
+            )
+        (logits,) = self.session.run(
+            ["logits"],
+            {
+                "input_features": input_features.cpu().numpy().astype(np.float32),
+                "attention_mask": attention_mask.cpu().numpy().astype(bool),
+            },
+        )
+        return torch.from_numpy(logits)
+
+
+class _LogitsOnly(nn.Module):
+    """Export wrapper: always takes a frame mask and returns bare logits."""
+
+    def __init__(self, model: nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_features, attention_mask):
+        return self.model(input_features, attention_mask=attention_mask)["logits"]
+
+
+def export_onnx(model: nn.Module, path: str, opset: int = 17) -> None:
+    """Export a WhisperAttentionClassifier to ONNX with dynamic batch and length.
+
+    The graph always uses the masked variable-length path; an all-true mask
+    over 3000 frames reproduces the padded path.
+    """
+    # The exporter restores the wrapper's mode afterwards, so it must be in
+    # eval mode too or the model is left with dropout enabled
+    wrapper = _LogitsOnly(model.to("cpu")).eval()
+    dummy_features = torch.zeros(1, 80, 3000)
+    dummy_mask = torch.ones(1, 3000, dtype=torch.bool)
+
+    torch.onnx.export(
+        wrapper,
+        (dummy_features, dummy_mask),
+        path,
+        input_names=["input_features", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_features": {0: "batch", 2: "frames"},
+            "attention_mask": {0: "batch", 1: "frames"},
+            "logits": {0: "batch"},
+        },
+        opset_version=opset,
+        dynamo=False,  # TorchScript exporter: no onnxscript dependency
+    )
+    logger.info("Exported emotion classifier to %s", path)
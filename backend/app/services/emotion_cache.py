@@ -0,0 +1,127 @@
+"""
+Emotion predictions cached by the content of the decoded audio.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from app.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class EmotionResultCache:
+    """Map a hash of decoded PCM to its emotion prediction.
+
+    Client retries re-upload the same recording, so the decoded samples hash
+    to the same key even if the container bytes differ (re-encoded headers,
+    stereo vs mono). ``namespace`` identifies the model that produced the
+    results so a different model or backend never reads stale entries.
+
+    Entries are small dicts, so the in-memory LRU is bounded by entry count.
+    With ``path`` set, results are also written to a SQLite file, read back
+    on a memory miss and kept to ``disk_max_entries`` (oldest dropped), so
+    they survive worker restarts and are shared between workers. The file
+    is opened lazily, per process, so a cache created before fork is safe.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(
+        self,
+        namespace: str,
+        maxsize: int = 4096,
+        path: str | None = None,
+        disk_max_entries: int = 100_000,
+    ):
+        self.namespace = namespace
+        self.disk_max_entries = disk_max_entries
+        self.path = path
+        self._memory = TTLCache(maxsize=maxsize)
+        self._conn: sqlite3.Connection | None = None
+        self._conn_pid: int | None = None
+        self._disk_lock = threading.Lock()
+        self._writes = 0
+        self.disk_hits = 0
+
+    @property
+    def _disk(self) -> sqlite3.Connection | None:
+        """This process's connection to the SQLite store (call with the lock held)."""
+        if not self.path:
+            return None
+        if self._conn is None or self._conn_pid != os.getpid():
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS emotion_results ("
+                "key TEXT PRIMARY KEY, emotion TEXT NOT NULL, confidence REAL, created_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS emotion_results_created_at ON emotion_results (created_at)"
+            )
+            self._conn, self._conn_pid = conn, os.getpid()
+        return self._conn
+
+    def key(self, pcm: np.ndarray, sample_rate: int, variant: str = "") -> str:
+        """BLAKE2 digest of the samples, tagged with the model and input variant."""
+        digest = hashlib.blake2b(np.ascontiguousarray(pcm).view(np.uint8), digest_size=16)
+        digest.update(f"{sample_rate}:{pcm.dtype}".encode())
+        return f"{self.namespace}:{variant}:{digest.hexdigest()}"
+
+    def get(self, key: str) -> dict | None:
+        result = self._memory.get(key)
+        if result is None and self.path:
+            try:
+                with self._disk_lock:
+                    row = self._disk.execute(
+                        "SELECT emotion, confidence FROM emotion_results WHERE key = ?", (key,)
+                    ).fetchone()
+            except sqlite3.Error as exc:
+                logger.warning("Emotion cache read failed: %s", exc)
+                row = None
+            if row is not None:
+                self.disk_hits += 1
+                result = {"emotion": row[0], "confidence": row[1]}
+                self._memory.set(key, result)
+        # Copy so callers cannot mutate the cached entry
+        return dict(result) if result is not None else None
+
+    def set(self, key: str, result: dict) -> None:
+        self._memory.set(key, dict(result))
+        if not self.path:
+            return
+        try:
+            with self._disk_lock:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO emotion_results VALUES (?, ?, ?, ?)",
+                    (key, result["emotion"], result["confidence"], time.time()),
+                )
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    self._prune()
+        except sqlite3.Error as exc:
+            logger.warning("Emotion cache write failed: %s", exc)
+
+    def _prune(self) -> None:
+        self._disk.execute(
+            "DELETE FROM emotion_results WHERE created_at < ("
+            "SELECT created_at FROM emotion_results ORDER BY created_at DESC LIMIT 1 OFFSET ?)",
+            (self.disk_max_entries - 1,),
+        )
+
+    def close(self) -> None:
+        with self._disk_lock:
+            if self._conn is not None and self._conn_pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+    def stats(self) -> dict:
+        stats = self._memory.stats()
+        stats["disk_hits"] = self.disk_hits
+        return stats
@@ -0,0 +1,74 @@
+"""
+Incrementally maintained per-user, per-day emotion counters.
+
+Counters live in the ``emotion_daily_stats`` table (see
+``sql/emotion_daily_stats.sql``) and are bumped whenever user messages
+with an emotion are persisted, so daily stats are one row lookup instead
+of a scan over that day's messages.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timezone
+
+from app import metrics
+from app.db import get_supabase
+
+logger = logging.getLogger(__name__)
+
+EMOTIONS = ("happy", "neutral", "sad", "angry")
+TABLE = "emotion_daily_stats"
+
+
+def _utc_day(created_at: str | None) -> date:
+    if not created_at:
+        return datetime.now(timezone.utc).date()
+    return datetime.fromisoformat(created_at.replace("Z", "+00:00")).astimezone(timezone.utc).date()
+
+
+def rollup_deltas(rows: list[dict]) -> list[dict]:
+    """Aggregate message rows into one counter delta per (user_id, day)."""
+    counts: dict[tuple[str, date], dict[str, int]] = defaultdict(lambda: dict.fromkeys(EMOTIONS, 0))
+    for row in rows:
+        emotion = (row.get("emotion") or "").lower()
+        if emotion not in EMOTIONS:
+            continue
+        counts[(row["user_id"], _utc_day(row.get("created_at")))][emotion] += 1
+
+    return [
+        {"user_id": user_id, "day": day.isoformat(), **emotion_counts}
+        for (user_id, day), emotion_counts in counts.items()
+    ]
+
+
+def record_messages(rows: list[dict]) -> None:
+    """Add freshly persisted message rows to the daily counters."""
+    deltas = rollup_deltas(rows)
+    if not deltas:
+        return
+    try:
+        with metrics.span("db_rollup_update"):
+            get_supabase().rpc("increment_emotion_daily_stats", {"deltas": deltas}).execute()
+    except Exception as exc:
+        # Counters drift until the next rebuild; the messages themselves are saved
+        logger.error("Failed to update emotion rollups for %d days: %s", len(deltas), exc)
+
+
+def get_daily_stats(user_id: str, day: date) -> dict:
+    """Read one day's counters; a missing row means no emotions that day."""
+    response = (
+        get_supabase().table(TABLE)
+        .select(", ".join(EMOTIONS))
+        .eq("user_id", user_id)
+        .eq("day", day.isoformat())
+        .limit(1)
+        .execute()
+    )
+    row = response.data[0] if response.data else {}
+    return {emotion: int(row.get(emotion) or 0) for emotion in EMOTIONS}
+
+
+def rebuild(user_id: str | None = None) -> int:
+    """Recompute counters from the messages table; returns rows written."""
+    response = get_supabase().rpc("rebuild_emotion_daily_stats", {"p_user_id": user_id}).execute()
+    return int(response.data or 0)
@@ -0,0 +1,274 @@
+"""
+LLM provider pool with per-provider timeouts, circuit breakers and hedging.
+"""
+
+import asyncio
+import logging
+import time
+import warnings
+from typing import AsyncIterator
+
+from app import metrics
+from app.config import settings
+
+warnings.filterwarnings("ignore", category=FutureWarning, module="google.generativeai")
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Stop calling a provider after repeated failures.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    the provider is skipped for ``reset_timeout`` seconds. Then one trial
+    call is let through (half-open): success closes the breaker, failure
+    opens it again. Meant to be used from the event loop thread only.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give back a half-open trial that was cancelled before finishing."""
+        self._trial_in_flight = False
+
+
+class GroqProvider:
+    """Groq chat completions through a persistent async client."""
+
+    name = "groq"
+
+    def __init__(self, api_key: str, model: str, timeout: float):
+        from groq import AsyncGroq
+
+        self.model = model
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_RESET_SECONDS)
+        # Retries are handled by the pool, not by the SDK
+        self.client = AsyncGroq(api_key=api_key, timeout=timeout, max_retries=0)
+
+    async def complete(self, messages: list[dict]) -> str:
+        completion = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=settings.LLM_TEMPERATURE,
+            max_tokens=settings.LLM_MAX_TOKENS,
+        )
+        return (completion.choices[0].message.content or "").strip()
+
+    async def stream(self, messages: list[dict]) -> AsyncIterator[str]:
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=settings.LLM_TEMPERATURE,
+            max_tokens=settings.LLM_MAX_TOKENS,
+            stream=True,
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+
+class GeminiProvider:
+    """Gemini through one GenerativeModel built at startup."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str, timeout: float, system_instruction: str):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.timeout = timeout
+        self.system_instruction = system_instruction
+        self.breaker = CircuitBreaker(settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_RESET_SECONDS)
+        self.model = genai.GenerativeModel(
+            model_name=model,
+            system_instruction=system_instruction,
+            generation_config={
+                "temperature": settings.LLM_TEMPERATURE,
+                "max_output_tokens": settings.LLM_MAX_TOKENS,
+            },
+        )
+
+    def _contents(self, messages: list[dict]) -> list[dict]:
+        # The main system prompt is baked into the model; other system
+        # messages (summaries, task prompts) are passed as user turns
+        return [
+            {"role": "model" if msg["role"] == "assistant" else "user", "parts": [msg["content"]]}
+            for msg in messages
+            if not (msg["role"] == "system" and msg["content"] == self.system_instruction)
+        ]
+
+    async def complete(self, messages: list[dict]) -> str:
+        response = await self.model.generate_content_async(self._contents(messages))
+        return (response.text or "").strip()
+
+    async def stream(self, messages: list[dict]) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(self._contents(messages), stream=True)
+        async for chunk in response:
+            # .text raises on chunks without parts (e.g. safety-blocked)
+            if chunk.parts and chunk.text:
+                yield chunk.text
+
+
+class ProviderPool:
+    """Try providers in order, skipping those whose breaker is open.
+
+    Each call is bounded by the provider's own timeout. With
+    ``hedge_delay_ms`` set, the next provider is started if the current one
+    has not answered (or, when streaming, produced a first token) within that
+    delay, and whichever finishes first wins.
+    """
+
+    def __init__(self, providers: list, hedge_delay_ms: float | None = None):
+        self.providers = providers
+        self.hedge_delay = hedge_delay_ms / 1000.0 if hedge_delay_ms else None
+
+    async def _race(self, start, discard=None, settle: bool = True) -> tuple:
+        """Run ``start(provider)`` across providers with fallback and hedging.
+
+        ``start`` returns a coroutine; the first one to succeed wins and the
+        others are cancelled. A loser that also succeeded is passed to the
+        ``discard`` coroutine. Returns ``(provider, result)``. With
+        ``settle=False`` the winner's breaker is left for the caller to
+        settle once the result has been consumed.
+        """
+        candidates = iter(self.providers)
+        owners: dict[asyncio.Task, object] = {}
+        errors = []
+        hedged = False
+
+        def launch() -> bool:
+            for provider in candidates:
+                if provider.breaker.allow():
+                    owners[asyncio.create_task(start(provider))] = provider
+                    return True
+            return False
+
+        launch()
+        try:
+            while owners:
+                timeout = self.hedge_delay if not hedged else None
+                done, _ = await asyncio.wait(owners, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if launch():
+                        logger.info("LLM hedge: starting fallback provider")
+                    continue
+
+                for task in done:
+                    provider = owners.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as exc:
+                        metrics.LLM_REQUESTS.inc(provider.name, "error")
+                        provider.breaker.record_failure()
+                        errors.append(f"{provider.name}: {exc!r}")
+                        logger.warning("LLM provider %s failed: %r", provider.name, exc)
+                        continue
+                    metrics.LLM_REQUESTS.inc(provider.name, "ok")
+                    if settle:
+                        provider.breaker.record_success()
+                    return provider, result
+
+                if not owners:
+                    launch()
+        finally:
+            for task, provider in owners.items():
+                provider.breaker.release()
+                if not task.done():
+                    task.cancel()
+                elif discard is not None and not task.cancelled() and task.exception() is None:
+                    await discard(task.result())
+
+        raise RuntimeError("All LLM providers failed or unavailable: " + "; ".join(errors))
+
+    async def complete(self, messages: list[dict]) -> str:
+        async def start(provider):
+            with metrics.span(f"llm_{provider.name}"):
+                text = await asyncio.wait_for(provider.complete(messages), provider.timeout)
+            if not text:
+                raise RuntimeError("empty reply")
+            return text
+
+        _, text = await self._race(start)
+        return text
+
+    async def stream(self, messages: list[dict]) -> AsyncIterator[str]:
+        async def start(provider):
+            chunks = provider.stream(messages)
+            try:
+                with metrics.span(f"llm_{provider.name}_first_token"):
+                    first = await asyncio.wait_for(anext(chunks), provider.timeout)
+            except BaseException:
+                await chunks.aclose()
+                raise
+            return chunks, first
+
+        async def discard(result):
+            await result[0].aclose()
+
+        # The breaker is settled when the stream ends, so a provider that
+        # keeps failing after its first token still trips it
+        provider, (chunks, first) = await self._race(start, discard, settle=False)
+        try:
+            yield first
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(anext(chunks), provider.timeout)
+                except StopAsyncIteration:
+                    provider.breaker.record_success()
+                    return
+                yield chunk
+        except asyncio.TimeoutError:
+            provider.breaker.record_failure()
+            logger.error("LLM provider %s stalled mid-stream", provider.name)
+            raise
+        except Exception as exc:
+            provider.breaker.record_failure()
+            logger.error("LLM provider %s failed mid-stream: %s", provider.name, exc)
+            raise
+        except BaseException:
+            # Abandoned by the consumer: not the provider's fault
+            provider.breaker.release()
+            raise
+        finally:
+            await chunks.aclose()
+
+    def stats(self) -> dict:
+        return {
+            provider.name: {"state": provider.breaker.state, "failures": provider.breaker.failures}
+            for provider in self.providers
+        }
@@ -0,0 +1,171 @@
+"""
+Write-behind queue for persisting chat messages.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable
+
+from app import metrics
+from app.config import settings
+from app.db import get_supabase
+from app.services import emotion_rollups
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriter:
+    """Accept message rows instantly and bulk-insert them in the background.
+
+    Rows are flushed as one multi-row insert once ``flush_size`` are queued
+    or the oldest has waited ``flush_interval_ms``. A single writer thread
+    consumes the queue in FIFO order, and each row gets its ``created_at``
+    at enqueue time, so per-user ordering is preserved even within a batch.
+    Failed flushes are retried with exponential backoff before the batch is
+    dropped. ``on_flush`` is called with every batch that was inserted.
+    """
+
+    def __init__(
+        self,
+        table: str = "messages",
+        flush_size: int = 50,
+        flush_interval_ms: float = 200.0,
+        max_queue: int = 10000,
+        max_retries: int = 5,
+        on_flush: Callable[[list[dict]], None] | None = None,
+    ):
+        self.table = table
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.on_flush = on_flush
+
+        self._queue: deque[tuple[dict, float]] = deque()
+        # Batch being inserted right now, still unsaved
+        self._inflight: list[dict] = []
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+
+        self._batches = 0
+        self._rows_written = 0
+        self._rows_dropped = 0
+        self._retries = 0
+        self._last_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def enqueue(self, row: dict) -> None:
+        """Queue a row for insertion; raises if the queue is full or closed."""
+        row.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Message writer is closed")
+            if len(self._queue) >= self.max_queue:
+                raise RuntimeError(f"Message queue full ({self.max_queue} rows)")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+                self._thread.start()
+            self._queue.append((row, time.monotonic()))
+            if len(self._queue) >= self.flush_size:
+                self._cond.notify()
+
+    def pending(self, user_id: str) -> list[dict]:
+        """Rows for ``user_id`` that are queued or being inserted (oldest first)."""
+        with self._cond:
+            rows = self._inflight + [row for row, _ in self._queue]
+        return [row for row in rows if row.get("user_id") == user_id]
+
+    def close(self, timeout: float | None = None) -> None:
+        """Flush everything still queued, then stop the writer thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._queue:
+            logger.error("Message writer closed with %d unsaved rows", len(self._queue))
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": len(self._queue),
+            "batches": self._batches,
+            "rows_written": self._rows_written,
+            "rows_dropped": self._rows_dropped,
+            "retries": self._retries,
+            "last_flush_ms": self._last_flush_ms,
+            "avg_flush_ms": self._total_flush_ms / self._batches if self._batches else 0.0,
+        }
+
+    def _next_batch(self) -> list[dict] | None:
+        with self._cond:
+            while True:
+                if not self._queue:
+                    if self._closed:
+                        return None
+                    self._cond.wait()
+                    continue
+
+                remaining = self._queue[0][1] + self.flush_interval - time.monotonic()
+                if len(self._queue) < self.flush_size and remaining > 0 and not self._closed:
+                    self._cond.wait(remaining)
+                    continue
+
+                count = min(self.flush_size, len(self._queue))
+                self._inflight = [self._queue.popleft()[0] for _ in range(count)]
+                return self._inflight
+
+    def _insert(self, rows: list[dict]) -> bool:
+        delay = 0.5
+        for attempt in range(self.max_retries + 1):
+            try:
+                with metrics.span("db_insert_batch"):
+                    get_supabase().table(self.table).insert(rows).execute()
+                return True
+            except Exception as exc:
+                if attempt == self.max_retries:
+                    logger.error("Dropping %d messages after %d retries: %s", len(rows), attempt, exc)
+                    return False
+                logger.warning("Message flush failed (attempt %d), retrying in %.1fs: %s", attempt + 1, delay, exc)
+                self._retries += 1
+                time.sleep(delay)
+                delay = min(delay * 2, 10.0)
+        return False
+
+    def _run(self) -> None:
+        while True:
+            rows = self._next_batch()
+            if rows is None:
+                return
+
+            start = time.perf_counter()
+            ok = self._insert(rows)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._cond:
+                self._inflight = []
+
+            self._batches += 1
+            self._last_flush_ms = elapsed_ms
+            self._total_flush_ms += elapsed_ms
+            if ok:
+                self._rows_written += len(rows)
+                if self.on_flush is not None:
+                    try:
+                        self.on_flush(rows)
+                    except Exception as exc:
+                        logger.error("Message flush callback failed: %s", exc)
+            else:
+                self._rows_dropped += len(rows)
+
+
+# Singleton instance
+message_writer = MessageWriter(
+    flush_size=settings.MESSAGE_FLUSH_SIZE,
+    flush_interval_ms=settings.MESSAGE_FLUSH_INTERVAL_MS,
+    max_queue=settings.MESSAGE_QUEUE_MAX,
+    max_retries=settings.MESSAGE_FLUSH_MAX_RETRIES,
+    on_flush=emotion_rollups.record_messages if settings.EMOTION_ROLLUPS_ENABLED else None,
+)
@@ -0,0 +1,92 @@
+"""
+Fit conversation history into a token budget for LLM prompts.
+"""
+
+import math
+import re
+
+from app.cache import TTLCache
+
+# Rough tokens per word piece for Llama/Gemini tokenizers on Vietnamese text;
+# per-message overhead covers role markers and separators.
+TOKENS_PER_WORD = 1.6
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_WORD_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (no tokenizer download or model call)."""
+    if not text:
+        return 0
+    return math.ceil(len(_WORD_PIECES.findall(text)) * TOKENS_PER_WORD)
+
+
+def message_tokens(message: dict) -> int:
+    return estimate_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+def fit_history(messages: list[dict], budget: int) -> tuple[list[dict], list[dict]]:
+    """Split history (oldest first) into ``(older, kept)``.
+
+    ``kept`` is the longest run of newest messages whose estimated size fits
+    in ``budget`` tokens; ``older`` is everything before it.
+    """
+    used = 0
+    start = len(messages)
+    while start > 0:
+        cost = message_tokens(messages[start - 1])
+        if used + cost > budget:
+            break
+        used += cost
+        start -= 1
+    return messages[:start], messages[start:]
+
+
+def _marker(message: dict) -> tuple:
+    return (message.get("created_at"), message.get("role"), message.get("content"))
+
+
+class HistorySummaries:
+    """Per-user rolling summary of turns that no longer fit in the prompt.
+
+    Each entry records the last message it covers, so only turns dropped
+    since the previous summary need to be folded in. Entries expire with the
+    user's idle timeout, like the conversation cache.
+    """
+
+    def __init__(self, max_users: int = 5000, idle_ttl: float = 1800.0):
+        self._summaries = TTLCache(maxsize=max_users, ttl=idle_ttl)
+        self._refreshing: set[str] = set()
+
+    def get(self, user_id: str) -> str | None:
+        entry = self._summaries.get(user_id)
+        return entry[0] if entry else None
+
+    def pending(self, user_id: str, older: list[dict]) -> tuple[str | None, list[dict]]:
+        """Return the current summary and the older turns it does not cover yet."""
+        entry = self._summaries.peek(user_id)
+        if entry is None:
+            return None, older
+        summary, last = entry
+        for index in range(len(older) - 1, -1, -1):
+            if _marker(older[index]) == last:
+                return summary, older[index + 1 :]
+        # The covered turns have scrolled out of the window; fold in all of them
+        return summary, older
+
+    def store(self, user_id: str, summary: str, covered: list[dict]) -> None:
+        self._summaries.set(user_id, (summary, _marker(covered[-1])))
+
+    def begin(self, user_id: str) -> bool:
+        """Claim the refresh for a user; False if one is already running."""
+        if user_id in self._refreshing:
+            return False
+        self._refreshing.add(user_id)
+        return True
+
+    def end(self, user_id: str) -> None:
+        self._refreshing.discard(user_id)
+
+    def stats(self) -> dict:
+        return self._summaries.stats()
@@ -0,0 +1,110 @@
+"""
+Cache of LLM replies for short, repeated user turns.
+"""
+
+import hashlib
+import json
+import re
+import unicodedata
+
+from app.cache import TTLCache
+from app.config import settings
+
+REPLY_CACHE_MODES = ("off", "exact", "greetings")
+
+# Short context-free turns that get the same answer whatever came before
+GREETINGS = frozenset(
+    {
+        "xin chào",
+        "chào",
+        "chào bạn",
+        "hello",
+        "hi",
+        "alo",
+        "cảm ơn",
+        "cảm ơn bạn",
+        "cám ơn",
+        "thank you",
+        "thanks",
+        "tạm biệt",
+        "bye",
+        "ừ",
+        "ừm",
+        "ok",
+        "oke",
+        "vâng",
+        "dạ",
+    }
+)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Case-fold, drop punctuation and collapse whitespace (diacritics are kept)."""
+    text = unicodedata.normalize("NFC", text).lower()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class ReplyCache:
+    """LRU + TTL cache of replies keyed on what the LLM would see.
+
+    In ``exact`` mode the key is the normalized user text, the detected
+    emotion and a hash of the conversation history in the prompt, so a reply
+    is only reused for an identical prompt. ``greetings`` mode only caches
+    turns listed in ``GREETINGS`` and ignores history for them. Turns longer
+    than ``max_chars`` are never cached.
+    """
+
+    def __init__(self, mode: str = "off", maxsize: int = 2048, ttl: float = 3600.0, max_chars: int = 40):
+        if mode not in REPLY_CACHE_MODES:
+            raise ValueError(f"Unknown REPLY_CACHE_MODE {mode!r}, expected one of {REPLY_CACHE_MODES}")
+        self.mode = mode
+        self.max_chars = max_chars
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def key(self, user_text: str, emotion: str, history: list[dict]) -> tuple | None:
+        """Cache key for a turn, or None if the turn must not be cached."""
+        if not self.enabled:
+            return None
+        text = normalize_text(user_text)
+        if not text or len(text) > self.max_chars:
+            return None
+        if self.mode == "greetings":
+            return (text, emotion) if text in GREETINGS else None
+
+        digest = hashlib.sha1(
+            json.dumps(
+                [(msg["role"], msg["content"]) for msg in history], ensure_ascii=False
+            ).encode("utf-8")
+        ).hexdigest()
+        return (text, emotion, digest)
+
+    def get(self, key: tuple | None) -> str | None:
+        return self._cache.get(key) if key is not None else None
+
+    def set(self, key: tuple | None, reply: str) -> None:
+        if key is not None and reply:
+            self._cache.set(key, reply)
+
+    def stats(self) -> dict:
+        stats = self._cache.stats()
+        stats["mode"] = self.mode
+        # Every hit is an LLM call that did not happen
+        stats["llm_calls_saved"] = stats["hits"]
+        return stats
+
+
+# Singleton instance
+reply_cache = ReplyCache(
+    mode=settings.REPLY_CACHE_MODE,
+    maxsize=settings.REPLY_CACHE_SIZE,
+    ttl=settings.REPLY_CACHE_TTL_SECONDS,
+    max_chars=settings.REPLY_CACHE_MAX_CHARS,
+)
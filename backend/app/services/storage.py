@@ -2,43 +2,208 @@
 Storage service for managing audio files.
 """
 
+import asyncio
 import os
 import time
 import logging
+import threading
+from collections import OrderedDict
 from app.config import settings
+from app.executor import run_io
 
 logger = logging.getLogger(__name__)
 
+# A file's mtime on disk is refreshed on use at most this often, so recency
+# survives restarts and is visible to other workers without a write per hit
+TOUCH_INTERVAL_SECONDS = 3600
+
+# Partial writes left by a crashed save are removed after this long
+STALE_TMP_SECONDS = 3600
+
 
 class StorageService:
-    """Service for managing audio file storage."""
+    """Service for managing audio file storage.
+
+    Stored ``.mp3`` files (TTS output, named by a hash of what they contain)
+    are tracked in an in-memory index of name -> (size, last use), ordered
+    least recently used first. It is built once with ``os.scandir`` and then
+    kept current by ``save``, ``indexed`` and ``has``, so finding what to delete never
+    touches the filesystem: files unused for AUDIO_CLEANUP_HOURS and, past
+    ``max_bytes`` in total, the least recently used ones. Both are a prefix
+    of the index.
+
+    ``save`` evicts what it pushed over the budget right away; ``sweep``
+    (run periodically by the app) handles ageing, in small batches.
+    """
 
-    def __init__(self):
+    def __init__(self, max_bytes: int = settings.AUDIO_CACHE_MAX_BYTES):
         """Initialize storage service."""
         os.makedirs(settings.AUDIO_DIR, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = settings.AUDIO_CLEANUP_HOURS * 3600
+        self._lock = threading.Lock()
+        # file name -> (size in bytes, last use), least recently used first
+        self._index: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+        self.expired = 0
+        # Files whose mtime on disk is due a refresh (applied by ``sweep``)
+        self._touches: set[str] = set()
+        self._load_index()
 
-    def cleanup_old_files(self):
-        """Delete audio files older than AUDIO_CLEANUP_HOURS."""
+    def _load_index(self) -> None:
+        entries = []
+        stale_tmp = []
+        tmp_cutoff = time.time() - STALE_TMP_SECONDS
+        with os.scandir(settings.AUDIO_DIR) as scan:
+            for entry in scan:
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith(".mp3"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+                elif entry.name.endswith(".tmp") and entry.stat().st_mtime < tmp_cutoff:
+                    stale_tmp.append(entry.name)
+        for mtime, name, size in sorted(entries):
+            self._index[name] = (size, mtime)
+            self._bytes += size
+        self._remove(stale_tmp)
+        logger.info(f"Audio store: {len(self._index)} files, {self._bytes} bytes")
+
+    def path(self, name: str) -> str:
+        return os.path.join(settings.AUDIO_DIR, name)
+
+    def indexed(self, name: str) -> bool:
+        """True if ``name`` is in the index; marks it as recently used.
+
+        Memory only, so it is safe to call on the event loop. The file's
+        mtime on disk is refreshed later, by ``sweep``.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._index.get(name)
+            if entry is None:
+                return False
+            self._index.move_to_end(name)
+            # Last use is kept at the granularity of on-disk touches
+            if now - entry[1] > TOUCH_INTERVAL_SECONDS:
+                self._index[name] = (entry[0], now)
+                self._touches.add(name)
+        return True
+
+    def has(self, name: str) -> bool:
+        """Like ``indexed``, but checks the filesystem (blocking)."""
+        path = self.path(name)
+        if self.indexed(name):
+            if os.path.exists(path):
+                return True
+            # Removed behind our back (another worker evicted it)
+            self._forget(name)
+            return False
+
+        # Possibly written by another worker process
         try:
-            cutoff_time = time.time() - (settings.AUDIO_CLEANUP_HOURS * 3600)
-            deleted_count = 0
+            size = os.path.getsize(path)
+        except OSError:
+            return False
+        with self._lock:
+            if name not in self._index:
+                self._index[name] = (size, time.time())
+                self._bytes += size
+        return True
 
-            for filename in os.listdir(settings.AUDIO_DIR):
-                file_path = os.path.join(settings.AUDIO_DIR, filename)
+    def save(self, name: str, data: bytes) -> str:
+        """Write ``data`` as ``name`` (atomically) and evict past the size budget."""
+        path = self.path(name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
 
-                # Only delete .mp3 files (TTS output)
-                if not filename.endswith(".mp3"):
-                    continue
+        with self._lock:
+            old = self._index.pop(name, None)
+            self._bytes += len(data) - (old[0] if old else 0)
+            self._index[name] = (len(data), time.time())
+        self._remove(self._claim(settings.AUDIO_JANITOR_BATCH, expired=False))
+        return path
 
-                if os.path.isfile(file_path):
-                    file_time = os.path.getmtime(file_path)
-                    if file_time < cutoff_time:
-                        try:
-                            os.remove(file_path)
-                            deleted_count += 1
-                            logger.info(f"Deleted old audio file: {filename}")
-                        except Exception as e:
-                            logger.warning(f"Failed to delete {filename}: {e}")
+    def _forget(self, name: str) -> None:
+        with self._lock:
+            entry = self._index.pop(name, None)
+            if entry is not None:
+                self._bytes -= entry[0]
+            self._touches.discard(name)
+
+    def _claim(self, limit: int, expired: bool = True) -> list[str]:
+        """Drop up to ``limit`` files due for deletion from the index and return them.
+
+        Over-budget and expired files are both a prefix of the LRU order.
+        The newest file is never evicted for size alone.
+        """
+        cutoff = time.time() - self.max_age
+        names = []
+        with self._lock:
+            while self._index and len(names) < limit:
+                name, (size, last_use) = next(iter(self._index.items()))
+                if expired and last_use < cutoff:
+                    self.expired += 1
+                elif self._bytes > self.max_bytes and len(self._index) > 1:
+                    self.evictions += 1
+                else:
+                    break
+                del self._index[name]
+                self._bytes -= size
+                self._touches.discard(name)
+                names.append(name)
+        return names
+
+    def _remove(self, names: list[str]) -> None:
+        for name in names:
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to delete {name}: {e}")
+
+    def _touch(self, names: list[str]) -> None:
+        for name in names:
+            try:
+                os.utime(self.path(name))
+            except OSError:
+                pass
+
+    async def sweep(self, batch_size: int = settings.AUDIO_JANITOR_BATCH) -> int:
+        """Delete expired and over-budget files, ``batch_size`` at a time in the I/O pool.
+
+        Pending mtime refreshes are written first. Returns the number of
+        files deleted.
+        """
+        with self._lock:
+            touches, self._touches = list(self._touches), set()
+        for i in range(0, len(touches), batch_size):
+            await run_io(self._touch, touches[i : i + batch_size])
+
+        deleted = 0
+        while True:
+            names = self._claim(batch_size)
+            if not names:
+                break
+            await run_io(self._remove, names)
+            deleted += len(names)
+            # Let other tasks run between batches
+            await asyncio.sleep(0)
+        if deleted:
+            logger.info(f"Audio janitor: {deleted} files deleted, {self._bytes} bytes kept")
+        return deleted
+
+    def cleanup_old_files(self):
+        """Delete expired and over-budget audio files (blocking; see ``sweep``)."""
+        try:
+            deleted_count = 0
+            while names := self._claim(settings.AUDIO_JANITOR_BATCH):
+                self._remove(names)
+                deleted_count += len(names)
 
             logger.info(f"Cleanup completed: {deleted_count} files deleted")
 
@@ -53,6 +218,16 @@ class StorageService:
             logger.warning(f"Failed to get file size for {file_path}: {e}")
             return 0
 
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
+
 
 # Singleton instance
 storage_service = StorageService()
@@ -0,0 +1,126 @@
+"""
+Server-side text-to-speech for assistant replies.
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import unicodedata
+
+from app import metrics
+from app.config import settings
+from app.executor import run_io
+from app.services.storage import storage_service
+
+logger = logging.getLogger(__name__)
+
+
+class TTSService:
+    """Synthesize replies with gTTS into a content-addressed file cache.
+
+    A reply's file is named by a hash of its text and the voice (language
+    and accent), so a reply that was spoken before - the busy fallback, a
+    cached greeting answer - is synthesized once and then served from
+    AUDIO_DIR. ``schedule`` returns the file name at once and synthesizes
+    in the I/O pool in the background; ``wait`` lets the audio endpoint
+    block until a pending file is ready. Concurrent requests for the same
+    reply share one synthesis. On the event loop only the storage index is
+    consulted; filesystem checks run in the I/O pool.
+    """
+
+    def __init__(self, lang: str = settings.TTS_LANG, tld: str = settings.TTS_TLD):
+        self.lang = lang
+        self.tld = tld
+        self._pending: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.synthesized = 0
+        self.failures = 0
+
+    def name(self, text: str) -> str:
+        """File name for ``text`` in the current voice."""
+        text = unicodedata.normalize("NFC", text).strip()
+        digest = hashlib.blake2b(f"{self.lang}|{self.tld}|{text}".encode("utf-8"), digest_size=16)
+        return f"tts-{digest.hexdigest()}.mp3"
+
+    def _synthesize(self, name: str, text: str) -> None:
+        from gtts import gTTS
+
+        buffer = io.BytesIO()
+        with metrics.span("tts_synthesize"):
+            gTTS(text=text, lang=self.lang, tld=self.tld).write_to_fp(buffer)
+        storage_service.save(name, buffer.getvalue())
+
+    def _ensure(self, name: str, text: str) -> bool:
+        """Synthesize unless the file exists (e.g. written by another worker)."""
+        if storage_service.has(name):
+            return False
+        self._synthesize(name, text)
+        return True
+
+    async def _run(self, name: str, text: str) -> None:
+        try:
+            if await run_io(self._ensure, name, text):
+                self.synthesized += 1
+            else:
+                self.hits += 1
+        except Exception as tts_err:
+            self.failures += 1
+            logger.warning(f"TTS failed for {name}: {tts_err}")
+        finally:
+            self._pending.pop(name, None)
+
+    def schedule(self, text: str) -> str | None:
+        """Name of the reply's audio file, starting synthesis if it is not stored.
+
+        Must be called from the event loop. Returns None for empty text.
+        """
+        if not text.strip():
+            return None
+        name = self.name(text)
+        if name in self._pending:
+            return name
+        if storage_service.indexed(name):
+            self.hits += 1
+            return name
+        self._pending[name] = asyncio.create_task(self._run(name, text))
+        return name
+
+    async def wait(self, name: str, timeout: float) -> bool:
+        """Wait for a pending synthesis; True if the file is available.
+
+        With several worker processes the synthesis may be running in
+        another one, so the file is also polled for until ``timeout``.
+        """
+        task = self._pending.get(name)
+        if task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(task), timeout)
+            except asyncio.TimeoutError:
+                return False
+            return storage_service.indexed(name)
+
+        if storage_service.indexed(name):
+            return True
+        if settings.SERVE_WORKERS <= 1:
+            return False
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not await run_io(storage_service.has, name):
+            if loop.time() >= deadline:
+                return False
+            await asyncio.sleep(0.5)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "synthesized": self.synthesized,
+            "failures": self.failures,
+            "pending": len(self._pending),
+            "storage": storage_service.stats(),
+        }
+
+
+tts_service = TTSService()
@@ -2,13 +2,20 @@
 Main entry point for the FastAPI application.
 """
 
+import asyncio
 import logging
+import os
+import time
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.config import settings
 from app.api import router
+from app import executor, metrics, services
+from app.middleware import BodySizeLimitMiddleware, MetricsMiddleware
+from app.models import HealthResponse
 
 # Configure logging
 logging.basicConfig(
@@ -39,7 +46,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Refuse oversized uploads while they stream in, not after buffering
+app.add_middleware(BodySizeLimitMiddleware, max_body_size=settings.MAX_REQUEST_SIZE)
+app.add_middleware(MetricsMiddleware)
+
 # Mount static audio directory
+os.makedirs(settings.AUDIO_DIR, exist_ok=True)
 app.mount("/audio", StaticFiles(directory=settings.AUDIO_DIR), name="audio")
 
 # Include API routes
@@ -57,24 +69,87 @@ async def root():
     }
 
 
+@app.get("/ready", response_model=HealthResponse)
+async def ready(response: Response):
+    """Readiness probe - 503 until models are loaded and warmed up."""
+    if not app.state.ready:
+        response.status_code = 503
+        return HealthResponse(status="starting", version=settings.API_VERSION)
+    return HealthResponse(status="ready", version=settings.API_VERSION)
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics (enable with METRICS_ENABLED)."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+async def _warmup():
+    """Load services and run a first inference without blocking startup."""
+    start = time.perf_counter()
+    try:
+        await executor.run_cpu(services.warmup)
+    except Exception as e:
+        logger.error(f"Warmup failed: {e}", exc_info=True)
+        return
+    app.state.ready = True
+    logger.info(f"Warmup completed in {time.perf_counter() - start:.2f}s")
+
+
+async def _audio_janitor():
+    """Periodically delete expired and over-budget audio files."""
+    # Building the file index scans AUDIO_DIR, so load the service off the loop
+    storage = await executor.run_io(getattr, services, "storage_service")
+    while True:
+        try:
+            await storage.sweep()
+        except Exception as e:
+            logger.error(f"Audio janitor error: {e}", exc_info=True)
+        await asyncio.sleep(settings.AUDIO_JANITOR_INTERVAL_SECONDS)
+
+
 @app.on_event("startup")
 async def startup_event():
     """Run on app startup."""
     logger.info("Starting Therapist Chat API...")
-    logger.info(f"Using device: {settings.EMOTION_MODEL_PATH}")
+    logger.info(f"Using emotion model: {settings.EMOTION_MODEL_PATH}")
+
+    app.state.ready = not settings.WARMUP_ON_STARTUP
+    if settings.WARMUP_ON_STARTUP:
+        app.state.warmup_task = asyncio.create_task(_warmup())
+    if settings.AUDIO_JANITOR_INTERVAL_SECONDS > 0:
+        app.state.janitor_task = asyncio.create_task(_audio_janitor())
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Run on app shutdown."""
     logger.info("Shutting down Therapist Chat API...")
+    janitor_task = getattr(app.state, "janitor_task", None)
+    if janitor_task is not None:
+        janitor_task.cancel()
+    services.shutdown()
+    executor.shutdown()
 
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level=settings.LOG_LEVEL.lower(),
-    )
+    if settings.SERVE_WORKERS > 1:
+        from app import prefork
+
+        prefork.serve(
+            app,
+            host=settings.HOST,
+            port=settings.PORT,
+            workers=settings.SERVE_WORKERS,
+            log_level=settings.LOG_LEVEL.lower(),
+        )
+    else:
+        uvicorn.run(
+            "main:app",
+            host=settings.HOST,
+            port=settings.PORT,
+            reload=True,
+            log_level=settings.LOG_LEVEL.lower(),
+        )
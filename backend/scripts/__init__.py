@@ -0,0 +1,4 @@
+"""
+Maintenance and benchmarking scripts. Run from the backend directory,
+e.g. ``python -m scripts.check_trim_parity fixtures/``.
+"""
@@ -0,0 +1,31 @@
+"""
+Rebuild the per-day emotion counters from the messages table.
+
+Run after applying sql/emotion_daily_stats.sql, and again whenever the
+counters may have drifted (e.g. after rollup update errors in the logs).
+
+Usage:
+    python -m scripts.backfill_emotion_rollups [--user USER_ID]
+"""
+
+import argparse
+import sys
+import time
+
+from app.services import emotion_rollups
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--user", help="Only rebuild this user's counters")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = emotion_rollups.rebuild(args.user)
+    scope = f"user {args.user}" if args.user else "all users"
+    print(f"Rebuilt {rows} daily rows for {scope} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
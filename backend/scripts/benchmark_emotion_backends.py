@@ -0,0 +1,124 @@
+"""
+Benchmark emotion inference backends: latency, memory and label agreement.
+
+Each backend runs in its own subprocess (so RSS numbers are not polluted by
+the others) over the same WAV clips. Labels are compared against the plain
+torch backend.
+
+Usage:
+    python -m scripts.benchmark_emotion_backends path/to/wavs [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from app.services.emotion_backends import BACKENDS
+
+
+def _rss_mb() -> float:
+    """Current resident set size in MB (Linux), else peak RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker(fixtures: Path, repeat: int) -> None:
+    """Measure the backend selected via EMOTION_BACKEND and print JSON."""
+    rss_start = _rss_mb()
+    start = time.perf_counter()
+    from app.services.emotion import emotion_service
+
+    load_s = time.perf_counter() - start
+    rss_loaded = _rss_mb()
+
+    clips = [path.read_bytes() for path in sorted(fixtures.glob("*.wav"))]
+    emotion_service.result_cache = None  # measure real inference on repeats
+    emotion_service.predict(clips[0])  # warmup
+
+    timings, labels = [], []
+    for _ in range(repeat):
+        labels = []
+        for audio_bytes in clips:
+            t0 = time.perf_counter()
+            labels.append(emotion_service.predict(audio_bytes)["emotion"])
+            timings.append(time.perf_counter() - t0)
+
+    print(
+        json.dumps(
+            {
+                "backend": emotion_service.backend.name,
+                "load_s": load_s,
+                "rss_start_mb": rss_start,
+                "rss_loaded_mb": rss_loaded,
+                "rss_end_mb": _rss_mb(),
+                "timings": timings,
+                "labels": labels,
+            }
+        )
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("fixtures", type=Path, help="Directory of .wav clips")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if not any(args.fixtures.glob("*.wav")):
+        print(f"No .wav files found in {args.fixtures}")
+        return 2
+
+    if args.worker:
+        _worker(args.fixtures, args.repeat)
+        return 0
+
+    results = {}
+    for backend in args.backends:
+        env = dict(os.environ, EMOTION_BACKEND=backend, EMOTION_BATCHING="false")
+        proc = subprocess.run(
+            [sys.executable, "-m", "scripts.benchmark_emotion_backends", str(args.fixtures),
+             "--repeat", str(args.repeat), "--worker"],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            print(f"[{backend}] failed:\n{proc.stderr.strip()}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if result["backend"] != backend:
+            print(f"[{backend}] fell back to {result['backend']}, skipping")
+            continue
+        results[backend] = result
+
+    reference = results.get("torch", {}).get("labels")
+    print(f"{'backend':<8} {'load s':>7} {'p50 ms':>8} {'p95 ms':>8} {'RSS MB':>8} {'agree':>7}")
+    for backend, result in results.items():
+        timings = sorted(result["timings"])
+        p50 = statistics.median(timings) * 1000
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000
+        agree = "-"
+        if reference:
+            same = sum(a == b for a, b in zip(reference, result["labels"]))
+            agree = f"{same / len(reference):.1%}"
+        print(
+            f"{backend:<8} {result['load_s']:>7.2f} {p50:>8.1f} {p95:>8.1f} "
+            f"{result['rss_end_mb']:>8.0f} {agree:>7}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Check that PcmBuffer gives the same samples however a stream is chunked.
+
+WebSocket frames need not end on a sample boundary, so a stream is fed to
+PcmBuffer whole and then split at every byte offset (and at random chunk
+sizes), for each supported encoding; every run must match the unsplit one.
+
+Usage:
+    python -m scripts.check_pcm_split [--seconds 0.05] [--seed 0]
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from app.services.audio_decode import PCM_DTYPES, PcmBuffer
+
+SAMPLE_RATE = 16000
+
+
+def _encode(signal: np.ndarray, encoding: str) -> bytes:
+    dtype = PCM_DTYPES[encoding]
+    if dtype.kind == "i":
+        signal = np.round(signal * 32767.0)
+    return signal.astype(dtype).tobytes()
+
+
+def _feed(chunks: list[bytes], encoding: str) -> np.ndarray:
+    buffer = PcmBuffer(SAMPLE_RATE, encoding)
+    for chunk in chunks:
+        buffer.append(chunk)
+    return buffer.samples()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=0.05, help="Length of the test signal")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the random chunk sizes")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    t = np.arange(int(args.seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    signal = (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+    failures = 0
+    for encoding in PCM_DTYPES:
+        data = _encode(signal, encoding)
+        expected = _feed([data], encoding)
+
+        splits = [[data[:i], data[i:]] for i in range(1, len(data))]
+        for _ in range(100):
+            cuts = np.sort(rng.integers(0, len(data), size=rng.integers(1, 20)))
+            splits.append([data[a:b] for a, b in zip([0, *cuts], [*cuts, len(data)])])
+
+        bad = 0
+        for chunks in splits:
+            got = _feed(chunks, encoding)
+            if got.shape != expected.shape or not np.array_equal(got, expected):
+                bad += 1
+        failures += bad
+        print(f"{encoding}: {len(splits)} chunkings, {bad} mismatched ({expected.shape[0]} samples)")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Compare trimmed (variable-length) emotion inference against the padded path.
+
+Runs every WAV clip in a fixture directory through EmotionModel twice, once
+padded to 30 s and once trimmed to its real length, and reports label
+agreement, confidence drift and per-clip CPU time for both modes.
+
+Usage:
+    python -m scripts.check_trim_parity path/to/wavs [--min-agreement 0.95]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from app.services.emotion import emotion_service
+
+
+def _run(audio_clips: list[bytes], trim: bool) -> tuple[list[dict], list[float]]:
+    emotion_service.trim_input = trim
+    emotion_service.result_cache = None  # measure real inference on repeats
+    results, timings = [], []
+    for audio_bytes in audio_clips:
+        start = time.perf_counter()
+        results.append(emotion_service.predict(audio_bytes))
+        timings.append(time.perf_counter() - start)
+    return results, timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("fixtures", type=Path, help="Directory of .wav clips")
+    parser.add_argument(
+        "--min-agreement",
+        type=float,
+        default=0.95,
+        help="Fail if the label agreement ratio is below this (default 0.95)",
+    )
+    args = parser.parse_args()
+
+    paths = sorted(args.fixtures.glob("*.wav"))
+    if not paths:
+        print(f"No .wav files found in {args.fixtures}")
+        return 2
+
+    clips = [path.read_bytes() for path in paths]
+
+    # Warm up both paths so the first clip doesn't pay one-off costs
+    _run(clips[:1], trim=False)
+    _run(clips[:1], trim=True)
+
+    padded, padded_times = _run(clips, trim=False)
+    trimmed, trimmed_times = _run(clips, trim=True)
+
+    agree = 0
+    drifts = []
+    for path, ref, out in zip(paths, padded, trimmed):
+        same = ref["emotion"] == out["emotion"]
+        agree += same
+        drifts.append(abs(ref["confidence"] - out["confidence"]))
+        if not same:
+            print(
+                f"MISMATCH {path.name}: padded={ref['emotion']} ({ref['confidence']:.2f}) "
+                f"trimmed={out['emotion']} ({out['confidence']:.2f})"
+            )
+
+    agreement = agree / len(clips)
+    padded_ms = statistics.median(padded_times) * 1000
+    trimmed_ms = statistics.median(trimmed_times) * 1000
+
+    print(f"Clips:              {len(clips)}")
+    print(f"Label agreement:    {agreement:.1%}")
+    print(f"Confidence drift:   mean={statistics.mean(drifts):.4f} max={max(drifts):.4f}")
+    print(f"Median latency:     padded={padded_ms:.1f} ms trimmed={trimmed_ms:.1f} ms")
+    print(f"Speedup:            {padded_ms / trimmed_ms:.2f}x")
+
+    emotion_service.close()
+    return 0 if agreement >= args.min_agreement else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""
+Export the emotion classifier's state dict to an ONNX Runtime artifact.
+
+Loads WhisperAttentionClassifier from EMOTION_MODEL_PATH, exports it with
+dynamic batch and frame axes, then checks the ONNX logits against PyTorch.
+
+Usage:
+    python -m scripts.export_emotion_onnx [--output model/whisper.onnx]
+"""
+
+import argparse
+import sys
+
+import torch
+
+from app.config import settings
+from app.services.emotion import load_classifier
+from app.services.emotion_backends import OnnxBackend, TorchBackend, export_onnx
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--weights", default=settings.EMOTION_MODEL_PATH)
+    parser.add_argument("--output", default=settings.EMOTION_ONNX_PATH)
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    device = torch.device("cpu")
+    model = load_classifier(args.weights, len(settings.EMOTION_LABELS), device)
+    export_onnx(model, args.output, opset=args.opset)
+
+    # Sanity check on a padded batch and a shorter masked batch
+    torch_backend = TorchBackend(model, device)
+    onnx_backend = OnnxBackend(args.output)
+    worst = 0.0
+    for frames in (3000, 600):
+        features = torch.randn(2, 80, frames)
+        mask = torch.ones(2, frames, dtype=torch.bool)
+        mask[1, frames // 2 :] = False
+        diff = (torch_backend(features, mask) - onnx_backend(features, mask)).abs().max().item()
+        worst = max(worst, diff)
+
+    print(f"Exported {args.weights} -> {args.output} (max |logit diff| = {worst:.2e})")
+    return 0 if worst < 1e-3 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
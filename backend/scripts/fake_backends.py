@@ -0,0 +1,171 @@
+"""
+In-process stand-ins for Supabase and the LLM providers, for offline runs.
+
+``FakeSupabase`` implements the subset of the supabase-py client the app
+uses: ``table(...).select/insert`` with ``eq/gte/lte/lt/order/limit/range``,
+``rpc(...)`` (unknown functions raise, so callers take their fallback
+path) and ``auth.get_user``. ``FakeLLMProvider`` plugs into
+``ProviderPool`` with a configurable latency and token rate.
+
+``install(...)`` swaps both into a running app.
+"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from app.services.llm_providers import CircuitBreaker, ProviderPool
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self._db = db
+        self._table = table
+        self._filters = []
+        self._order: tuple[str, bool] | None = None
+        self._limit: int | None = None
+        self._range: tuple[int, int] | None = None
+        self._columns: list[str] | None = None
+        self._insert: list[dict] | None = None
+
+    def select(self, columns: str = "*"):
+        if columns.strip() != "*":
+            self._columns = [column.strip() for column in columns.split(",")]
+        return self
+
+    def insert(self, rows):
+        self._insert = [dict(row) for row in (rows if isinstance(rows, list) else [rows])]
+        return self
+
+    def _where(self, column, op, value):
+        self._filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value):
+        return self._where(column, lambda a, b: a == b, value)
+
+    def gte(self, column, value):
+        return self._where(column, lambda a, b: a is not None and a >= b, value)
+
+    def lte(self, column, value):
+        return self._where(column, lambda a, b: a is not None and a <= b, value)
+
+    def lt(self, column, value):
+        return self._where(column, lambda a, b: a is not None and a < b, value)
+
+    def order(self, column, desc=False):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def range(self, start, end):
+        # Inclusive on both ends, like PostgREST
+        self._range = (start, end)
+        return self
+
+    def execute(self):
+        self._db.wait()
+        with self._db.lock:
+            rows = self._db.tables.setdefault(self._table, [])
+            if self._insert is not None:
+                rows.extend(self._insert)
+                return _Result(self._insert)
+
+            result = [row for row in rows if all(op(row.get(col), value) for col, op, value in self._filters)]
+        if self._order is not None:
+            column, desc = self._order
+            result.sort(key=lambda row: row.get(column) or "", reverse=desc)
+        if self._range is not None:
+            result = result[self._range[0] : self._range[1] + 1]
+        if self._limit is not None:
+            result = result[: self._limit]
+        if self._columns is not None:
+            result = [{column: row.get(column) for column in self._columns} for row in result]
+        return _Result(result)
+
+
+class _Rpc:
+    def __init__(self, db: "FakeSupabase", name: str, params: dict):
+        self._db = db
+        self._name = name
+
+    def execute(self):
+        self._db.wait()
+        raise RuntimeError(f"function {self._name} does not exist (FakeSupabase)")
+
+
+class _Auth:
+    def get_user(self, token: str):
+        # Any non-empty token is a valid session for user "<token>"
+        return SimpleNamespace(user=SimpleNamespace(id=token) if token else None)
+
+
+class FakeSupabase:
+    """Thread-safe in-memory tables with an optional per-call latency."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000.0
+        self.tables: dict[str, list[dict]] = {}
+        self.lock = threading.Lock()
+        self.auth = _Auth()
+
+    def wait(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def rpc(self, name: str, params: dict | None = None) -> _Rpc:
+        return _Rpc(self, name, params or {})
+
+
+class FakeLLMProvider:
+    """LLM provider that answers after ``latency_ms`` at ``tokens_per_second``."""
+
+    def __init__(
+        self,
+        name: str = "fake",
+        latency_ms: float = 300.0,
+        tokens_per_second: float = 200.0,
+        reply: str = "Mình hiểu cảm giác của bạn, kể thêm cho mình nghe nhé.",
+        timeout: float = 30.0,
+    ):
+        self.name = name
+        self.latency = latency_ms / 1000.0
+        self.token_interval = 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0
+        self.tokens = [word + " " for word in reply.split()]
+        self.timeout = timeout
+        self.breaker = CircuitBreaker()
+
+    async def complete(self, messages: list[dict]) -> str:
+        await asyncio.sleep(self.latency + self.token_interval * len(self.tokens))
+        return "".join(self.tokens).strip()
+
+    async def stream(self, messages: list[dict]):
+        await asyncio.sleep(self.latency)
+        for token in self.tokens:
+            yield token
+            if self.token_interval:
+                await asyncio.sleep(self.token_interval)
+
+
+def install(db_latency_ms: float = 0.0, llm_latency_ms: float = 300.0, tokens_per_second: float = 200.0):
+    """Point the app at in-memory Supabase and a fake LLM; returns the fake db."""
+    from app import db, services
+
+    fake_db = FakeSupabase(latency_ms=db_latency_ms)
+    db._client = fake_db
+    services.chatbot_service.pool = ProviderPool(
+        [FakeLLMProvider(latency_ms=llm_latency_ms, tokens_per_second=tokens_per_second)]
+    )
+    return fake_db
@@ -0,0 +1,261 @@
+"""
+Offline end-to-end load benchmark for /chat and /chat/stream.
+
+Boots the app with uvicorn in this process against in-memory Supabase and a
+fake LLM (see ``scripts.fake_backends``), replays WAV clips at a target
+concurrency over real HTTP and reports throughput plus p50/p95/p99 latency
+per endpoint and per instrumented stage (``app.metrics`` spans). No network
+access or accounts are needed.
+
+Usage:
+    python -m scripts.load_benchmark path/to/wavs [--concurrency 8] [--requests 200]
+        [--endpoint chat|stream|both] [--llm-latency-ms 300] [--db-latency-ms 20]
+        [--json results.json] [--max-p95-ms 1500]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _summary(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "mean_ms": statistics.fmean(values) * 1000,
+        "p50_ms": _percentile(values, 50) * 1000,
+        "p95_ms": _percentile(values, 95) * 1000,
+        "p99_ms": _percentile(values, 99) * 1000,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _record_stages() -> dict[str, list[float]]:
+    """Keep raw span durations next to the histogram for exact percentiles."""
+    from app import metrics
+
+    samples: dict[str, list[float]] = defaultdict(list)
+    observe = metrics.STAGE_SECONDS.observe
+
+    def recording_observe(value: float, *labels: str) -> None:
+        samples[labels[0]].append(value)
+        observe(value, *labels)
+
+    metrics.STAGE_SECONDS.observe = recording_observe
+    return samples
+
+
+def _start_server(port: int):
+    import uvicorn
+
+    import main
+
+    config = uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, name="bench-server", daemon=True)
+    thread.start()
+    return server, thread
+
+
+async def _wait_ready(client, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("App did not become ready")
+
+
+async def _one_request(client, endpoint: str, clip: tuple[str, bytes], user: str) -> float | None:
+    """Send one turn; returns time to first token for the stream endpoint."""
+    name, audio = clip
+    files = {"file": (name, audio, "audio/wav")}
+    data = {"text": "Hôm nay mình thấy hơi mệt."}
+    headers = {"Authorization": f"Bearer {user}"}
+
+    if endpoint == "/chat":
+        response = await client.post(endpoint, files=files, data=data, headers=headers)
+        response.raise_for_status()
+        return None
+
+    start = time.perf_counter()
+    first_token = None
+    async with client.stream("POST", endpoint, files=files, data=data, headers=headers) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if first_token is None and line == "event: token":
+                first_token = time.perf_counter() - start
+    return first_token
+
+
+async def _run_load(
+    args, clips: list[tuple[str, bytes]], port: int, stages: dict[str, list[float]]
+) -> dict:
+    import httpx
+
+    endpoints = {"chat": ["/chat"], "stream": ["/chat/stream"], "both": ["/chat", "/chat/stream"]}[args.endpoint]
+    latencies: dict[str, list[float]] = defaultdict(list)
+    first_tokens: list[float] = []
+    errors: dict[str, int] = defaultdict(int)
+    next_index = 0
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}", timeout=120.0, limits=limits
+    ) as client:
+        await _wait_ready(client, timeout=300.0)
+
+        # Warm the path once per endpoint before measuring
+        for endpoint in endpoints:
+            await _one_request(client, endpoint, clips[0], "warmup-user")
+        stages.clear()
+
+        async def worker() -> None:
+            nonlocal next_index
+            while next_index < args.requests:
+                index = next_index
+                next_index += 1
+                endpoint = endpoints[index % len(endpoints)]
+                start = time.perf_counter()
+                try:
+                    first_token = await _one_request(
+                        client, endpoint, clips[index % len(clips)], f"user-{index % args.users}"
+                    )
+                except Exception as exc:
+                    errors[f"{endpoint}: {type(exc).__name__}"] += 1
+                    continue
+                latencies[endpoint].append(time.perf_counter() - start)
+                if first_token is not None:
+                    first_tokens.append(first_token)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    completed = sum(len(values) for values in latencies.values())
+    return {
+        "requests": completed,
+        "errors": dict(errors),
+        "elapsed_s": elapsed,
+        "rps": completed / elapsed if elapsed else 0.0,
+        "endpoints": {endpoint: _summary(values) for endpoint, values in latencies.items()},
+        "stream_first_token": _summary(first_tokens) if first_tokens else None,
+    }
+
+
+def _print_report(report: dict) -> None:
+    print(
+        f"\n{report['requests']} requests in {report['elapsed_s']:.1f}s "
+        f"-> {report['rps']:.2f} req/s (concurrency {report['concurrency']})"
+    )
+    if report["errors"]:
+        print(f"errors: {report['errors']}")
+
+    header = f"{'':<28}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)"
+    rows = [(f"endpoint {name}", stats) for name, stats in report["endpoints"].items()]
+    if report["stream_first_token"]:
+        rows.append(("stream first token", report["stream_first_token"]))
+    rows += [(f"stage {name}", stats) for name, stats in sorted(report["stages"].items())]
+
+    print(header)
+    for label, stats in rows:
+        print(
+            f"{label:<28}{stats['count']:>7}{stats['mean_ms']:>10.1f}"
+            f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("fixtures", type=Path, help="Directory of .wav clips to replay")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--endpoint", choices=("chat", "stream", "both"), default="both")
+    parser.add_argument("--users", type=int, default=50, help="Distinct fake users (default 50)")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--db-latency-ms", type=float, default=20.0)
+    parser.add_argument(
+        "--emotion-cache",
+        action="store_true",
+        help="Keep the emotion result cache on (replayed clips then hit it)",
+    )
+    parser.add_argument("--json", type=Path, help="Also write the report as JSON")
+    parser.add_argument("--max-p95-ms", type=float, help="Exit 1 if any endpoint p95 exceeds this")
+    args = parser.parse_args()
+
+    clips = [(path.name, path.read_bytes()) for path in sorted(args.fixtures.glob("*.wav"))]
+    if not clips:
+        print(f"No .wav files in {args.fixtures}", file=sys.stderr)
+        return 2
+
+    # Configure before the app reads its settings
+    os.environ["METRICS_ENABLED"] = "true"
+    os.environ.setdefault("WARMUP_ON_STARTUP", "true")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if not args.emotion_cache:
+        os.environ["EMOTION_CACHE_SIZE"] = "0"
+    for name in ("SUPABASE_JWT_SECRET", "SUPABASE_JWKS_URL"):
+        os.environ.pop(name, None)  # tokens are checked by the fake auth
+
+    from scripts import fake_backends
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    stages = _record_stages()
+    fake_backends.install(
+        db_latency_ms=args.db_latency_ms,
+        llm_latency_ms=args.llm_latency_ms,
+        tokens_per_second=args.tokens_per_second,
+    )
+    port = _free_port()
+    server, thread = _start_server(port)
+
+    try:
+        report = asyncio.run(_run_load(args, clips, port, stages))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=30)
+
+    report["concurrency"] = args.concurrency
+    report["stages"] = {name: _summary(values) for name, values in stages.items() if values}
+    _print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+    if args.max_p95_ms is not None:
+        slow = {
+            name: stats["p95_ms"]
+            for name, stats in report["endpoints"].items()
+            if stats["p95_ms"] > args.max_p95_ms
+        }
+        if slow or report["errors"]:
+            print(f"FAIL: p95 over {args.max_p95_ms:.0f} ms: {slow}, errors: {report['errors']}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+Measure cold-start cost: import time, time to first response and time to ready.
+
+Starts the app with uvicorn in a fresh subprocess and polls ``/`` (first
+response) and ``/ready`` (warmup finished). Run it on two revisions to
+compare before/after; on revisions without ``/ready`` (404) the app is
+ready as soon as it responds, since models load at import.
+
+Usage:
+    python -m scripts.measure_startup [--port 8765] [--timeout 120]
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def _wait_for(url: str, deadline: float) -> tuple[float, int] | None:
+    """Poll ``url`` until it answers 200 or 404; returns (time, status)."""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter(), 200
+        except urllib.error.HTTPError as error:
+            if error.code == 404:
+                return time.perf_counter(), 404
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True
+    )
+    import_s = float(result.stdout.strip().splitlines()[-1])
+    print(f"import main:            {import_s:.2f}s")
+
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"]
+    )
+    try:
+        deadline = start + args.timeout
+        base = f"http://127.0.0.1:{args.port}"
+        first = _wait_for(f"{base}/", deadline)
+        if first is None:
+            print("server did not respond before timeout")
+            return 1
+        print(f"time to first response: {first[0] - start:.2f}s")
+
+        ready = _wait_for(f"{base}/ready", deadline)
+        if ready is None:
+            print("server did not become ready before timeout")
+            return 1
+        if ready[1] == 404:
+            # No readiness probe: everything was loaded before the first response
+            ready = first
+            print("(no /ready endpoint, ready at first response)")
+        print(f"time to ready:          {ready[0] - start:.2f}s")
+    finally:
+        server.terminate()
+        server.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+-- Per-user, per-day emotion counters backing /emotion-stats.
+-- Days are UTC dates of messages.created_at, matching the endpoint.
+-- Apply once in the Supabase SQL editor, then run
+-- `python -m scripts.backfill_emotion_rollups` and set EMOTION_ROLLUPS_ENABLED=true.
+
+create table if not exists public.emotion_daily_stats (
+    user_id uuid not null,
+    day date not null,
+    happy integer not null default 0,
+    neutral integer not null default 0,
+    sad integer not null default 0,
+    angry integer not null default 0,
+    updated_at timestamptz not null default now(),
+    primary key (user_id, day)
+);
+
+-- Add a batch of counter deltas: [{"user_id", "day", "happy", ...}, ...].
+-- Each (user_id, day) must appear at most once per call.
+create or replace function public.increment_emotion_daily_stats(deltas jsonb)
+returns void
+language sql
+as $$
+    insert into public.emotion_daily_stats as s (user_id, day, happy, neutral, sad, angry)
+    select
+        (d->>'user_id')::uuid,
+        (d->>'day')::date,
+        coalesce((d->>'happy')::int, 0),
+        coalesce((d->>'neutral')::int, 0),
+        coalesce((d->>'sad')::int, 0),
+        coalesce((d->>'angry')::int, 0)
+    from jsonb_array_elements(deltas) as d
+    on conflict (user_id, day) do update set
+        happy = s.happy + excluded.happy,
+        neutral = s.neutral + excluded.neutral,
+        sad = s.sad + excluded.sad,
+        angry = s.angry + excluded.angry,
+        updated_at = now();
+$$;
+
+-- Recompute counters from messages, for one user or (p_user_id null) everyone.
+create or replace function public.rebuild_emotion_daily_stats(p_user_id uuid default null)
+returns integer
+language plpgsql
+as $$
+declare
+    affected integer;
+begin
+    delete from public.emotion_daily_stats
+    where p_user_id is null or user_id = p_user_id;
+
+    insert into public.emotion_daily_stats (user_id, day, happy, neutral, sad, angry)
+    select
+        user_id,
+        (created_at at time zone 'UTC')::date,
+        count(*) filter (where lower(emotion) = 'happy'),
+        count(*) filter (where lower(emotion) = 'neutral'),
+        count(*) filter (where lower(emotion) = 'sad'),
+        count(*) filter (where lower(emotion) = 'angry')
+    from public.messages
+    where emotion is not null
+      and (p_user_id is null or user_id = p_user_id)
+    group by 1, 2;
+
+    get diagnostics affected = row_count;
+    return affected;
+end;
+$$;
@@ -0,0 +1,30 @@
+-- Grouped emotion counts per local day/hour for the /emotion-stats/range endpoint.
+-- Returns one row per (bucket, emotion) so the result size depends on the
+-- number of buckets, not the number of messages.
+
+create or replace function public.emotion_histogram(
+    p_user_id uuid,
+    p_start timestamptz,
+    p_end timestamptz,
+    p_tz text,
+    p_granularity text default 'day'
+)
+returns table (bucket timestamp, emotion text, count bigint)
+language sql
+stable
+as $$
+    select
+        date_trunc(p_granularity, created_at at time zone p_tz) as bucket,
+        lower(emotion) as emotion,
+        count(*) as count
+    from public.messages
+    where user_id = p_user_id
+      and emotion is not null
+      and created_at >= p_start
+      and created_at < p_end
+    group by 1, 2
+    order by 1;
+$$;
+
+create index if not exists messages_user_created_at_idx
+    on public.messages (user_id, created_at);